@@ -1,13 +1,35 @@
 #!/usr/bin/env python3
-from flask import Flask, request, render_template_string, jsonify, send_from_directory
+import time
+BOOT_STARTED = time.time()
+
+from flask import Flask, Response, request, render_template_string, jsonify, send_from_directory, stream_with_context
 import subprocess
-import whisper
+import importlib
+import sys
+import types
 import warnings
 import os
 import tempfile
 import threading
+import uuid
+import collections
+import hashlib
+import gzip
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import re
+import random
+import bisect
+import socket
+import sqlite3
+import fcntl
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, Future
+import numpy as np
 from google import genai
-import time
+from prompts import (build_condense_prompt, build_partial_summary_prompt, build_summary_prompt, estimate_tokens,
+                     summary_prompt_tokens, CHARS_PER_TOKEN, NOTES_SOURCE)
 
 # Silence warnings
 warnings.filterwarnings("ignore")
@@ -15,10 +37,1297 @@ warnings.filterwarnings("ignore")
 app = Flask(__name__)
 
 # Global variables
-processing_status = {"status": "ready", "progress": 0, "message": "Ready"}
 whisper_model = None
-current_transcript = ""
-current_summary = ""
+whisper_model_lock = threading.Lock()
+model_warm = threading.Event()  # set once the model has run an inference in this process
+
+# Inference profiles trade speed for accuracy on CPU hosts. Each setting can also be overridden on its own
+# (WHISPER_MODEL, WHISPER_QUANTIZE=int8|none, WHISPER_BEAM_SIZE, WHISPER_TEMPERATURES=0,0.2,...).
+WHISPER_TEMPERATURE_FALLBACK = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]  # Whisper's default
+INFERENCE_PROFILES = {
+    "accurate": {"model": "small", "quantize": False, "beam_size": 5, "temperature": WHISPER_TEMPERATURE_FALLBACK},
+    "balanced": {"model": "base", "quantize": False, "beam_size": None, "temperature": WHISPER_TEMPERATURE_FALLBACK},
+    "fast": {"model": "base", "quantize": True, "beam_size": None, "temperature": [0.0]},
+}
+
+def inference_profile(name, env=os.environ):
+    profile = dict(INFERENCE_PROFILES[name])
+    if env.get("WHISPER_MODEL"):
+        profile["model"] = env["WHISPER_MODEL"]
+    if env.get("WHISPER_QUANTIZE"):
+        profile["quantize"] = env["WHISPER_QUANTIZE"] == "int8"
+    if env.get("WHISPER_BEAM_SIZE"):
+        profile["beam_size"] = int(env["WHISPER_BEAM_SIZE"]) or None
+    if env.get("WHISPER_TEMPERATURES"):
+        profile["temperature"] = [float(value) for value in env["WHISPER_TEMPERATURES"].split(",")]
+    return profile
+
+def decode_options(profile):
+    # A single temperature disables Whisper's fallback re-decoding of low-confidence windows
+    options = {"temperature": tuple(profile["temperature"])}
+    if profile["beam_size"]:
+        options["beam_size"] = profile["beam_size"]
+    return options
+
+WHISPER_PROFILE = os.environ.get("WHISPER_PROFILE", "balanced")
+PROFILE = inference_profile(WHISPER_PROFILE)
+WHISPER_MODEL = PROFILE["model"]
+WHISPER_QUANTIZE = PROFILE["quantize"]
+MODEL_ID = WHISPER_MODEL + ("-int8" if WHISPER_QUANTIZE else "")  # identifies the weights in cache keys
+WHISPER_THREADS = int(os.environ.get("WHISPER_THREADS", 0))  # torch threads per job slot, 0: cores / slots
+WHISPER_INTEROP_THREADS = int(os.environ.get("WHISPER_INTEROP_THREADS", 1))
+WHISPER_PRELOAD = os.environ.get("WHISPER_PRELOAD") == "1"  # load and warm up the model at startup
+WHISPER_SHARED_MODEL = os.environ.get("WHISPER_SHARED_MODEL") == "1"  # loaded in the gunicorn master, see gunicorn.conf.py
+
+# Two-pass transcription: a small model's draft is shown first, then replaced by the full model's transcript
+DRAFT_MODEL = os.environ.get("DRAFT_MODEL", "")  # e.g. tiny; empty transcribes in one pass
+DRAFT_SUMMARY = os.environ.get("DRAFT_SUMMARY", "0") == "1"  # also summarize the draft while refining
+DRAFT_DECODE_OPTIONS = {"temperature": (0.0,)}  # greedy, no fallback re-decoding
+draft_model = None
+boot_timings = {}
+SAMPLE_RATE = 16000  # Whisper works on 16 kHz mono audio
+
+# Parallel transcription: long audio is cut at quiet points into overlapping chunks for a process pool
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", 0))  # 0 or 1 disables the pool
+CHUNK_SECONDS = float(os.environ.get("CHUNK_SECONDS", 300))
+CHUNK_OVERLAP_SECONDS = float(os.environ.get("CHUNK_OVERLAP_SECONDS", 2))
+
+# In-process transcription runs window by window so text can be shown while the rest is decoding
+TRANSCRIBE_WINDOW_SECONDS = float(os.environ.get("TRANSCRIBE_WINDOW_SECONDS", 60))  # 0 transcribes in one call
+PROMPT_CONTEXT_CHARS = 500  # tail of the previous window's text passed on as context
+# Streaming reads the audio from ffmpeg one window at a time instead of decoding the whole recording up
+# front, so memory use stays flat however long the recording is
+TRANSCRIBE_STREAMING = os.environ.get("TRANSCRIBE_STREAMING", "0") == "1"
+
+# Silence removal: stretches of silence longer than VAD_MIN_SILENCE_SECONDS are cut out before transcription
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "0") == "1"
+VAD_MIN_SILENCE_SECONDS = float(os.environ.get("VAD_MIN_SILENCE_SECONDS", 2.0))
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", 10))  # above the recording's noise floor
+VAD_SILENCE_LEVEL_DB = -60  # anything quieter than this (dBFS) always counts as silence
+VAD_PADDING_SECONDS = 0.3  # kept on both sides of every cut so words are not clipped
+VAD_FRAME_SECONDS = 0.03
+transcribe_pool = None
+transcribe_pool_lock = threading.Lock()
+
+# Per-thread progress callback for the whisper.transcribe hook below
+transcribe_progress = threading.local()
+
+# Options passed to every transcribe() call; part of the transcript cache key
+DECODE_OPTIONS = decode_options(PROFILE)
+# Everything else that changes the transcript of the same media with the same model. Without silence
+# removal the key is the decode options alone, so transcripts cached before it existed stay valid.
+TRANSCRIPT_OPTIONS = dict(DECODE_OPTIONS, vad=[VAD_MIN_SILENCE_SECONDS, VAD_THRESHOLD_DB]) if VAD_ENABLED else DECODE_OPTIONS
+
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(tempfile.gettempdir(), "video-summarizer-cache"))
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_BYTES", 500 * 1024 * 1024))  # 0 disables
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Uploads and per-job scratch files; unfinished uploads are kept this long for resuming
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "video-summarizer-uploads"))
+UPLOAD_TTL_SECONDS = int(os.environ.get("UPLOAD_TTL_SECONDS", 24 * 3600))
+EARLY_PROBE_BYTES = 2 * 1024 * 1024  # start of an upload that is probed before the rest has arrived
+# Transcription of an upload that is still arriving gives up its slot after this long without new data
+UPLOAD_STALL_SECONDS = int(os.environ.get("UPLOAD_STALL_SECONDS", 30))
+
+SUMMARY_MODEL = "gemini-2.5-flash"
+SUMMARY_CACHE_BACKEND = os.environ.get("SUMMARY_CACHE_BACKEND", "memory")  # memory, disk or none
+SUMMARY_CACHE_TTL = int(os.environ.get("SUMMARY_CACHE_TTL", 24 * 3600))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get("SUMMARY_CACHE_MAX_ENTRIES", 1000))
+# Speculative summaries: after a job's summary, the variants users most often switch to next are generated
+# in the background, so switching is a cache hit. The budget is in Gemini requests per job; 0 disables it.
+SPECULATIVE_SUMMARY_BUDGET = int(os.environ.get("SPECULATIVE_SUMMARY_BUDGET", 0))
+SPECULATIVE_MAX_QUEUED = 8  # finished jobs waiting for their variants; beyond that the oldest are dropped
+SUMMARY_CONDENSE = os.environ.get("SUMMARY_CONDENSE", "0") == "1"  # shorter lengths from a cached longer summary
+SUMMARY_LENGTHS = ["very short", "short", "medium", "long"]  # as offered on the page, shortest first
+SUMMARY_FORMATS = ["format 1", "format 2", "format 3"]
+
+# Map-reduce summarization: transcripts over the threshold are summarized in chunks, then combined
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.environ.get("MAP_REDUCE_THRESHOLD_TOKENS", 60000))
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 15000))
+SUMMARY_MAX_IN_FLIGHT = int(os.environ.get("SUMMARY_MAX_IN_FLIGHT", 4))
+
+# Gemini client pool: clients are reused per API key, with rate limiting, retries and a global request cap
+GEMINI_MAX_IN_FLIGHT = int(os.environ.get("GEMINI_MAX_IN_FLIGHT", 8))  # across all keys and jobs
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", 60))  # per API key
+GEMINI_BURST = int(os.environ.get("GEMINI_BURST", 5))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", 4))
+GEMINI_BACKOFF_BASE = 1.0  # seconds, doubled on every retry
+GEMINI_BACKOFF_MAX = 30.0
+GEMINI_POOL_SIZE = 32  # API keys whose clients are kept
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+GZIP_MIN_BYTES = 1024  # smaller responses are sent uncompressed
+
+# Job registry: one entry per /process call, keyed by job ID. The memory store lives in this process only;
+# the sqlite store is shared by every worker and process using the same database file (see SqliteJobStore).
+JOB_STORE = os.environ.get("JOB_STORE", "memory")  # memory or sqlite
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+PROCESS_JOBS = os.environ.get("PROCESS_JOBS", "1") == "1"  # 0: this process only serves requests, see `python app.py worker`
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 3600))
+JOB_POLL_INTERVAL = 0.5  # seconds between checks for changes made by other processes
+WORKER_HEARTBEAT_SECONDS = 5
+WORKER_TIMEOUT_SECONDS = int(os.environ.get("WORKER_TIMEOUT_SECONDS", 60))  # silent this long: its jobs are queued again
+PROGRESS_STREAM_INTERVAL = 5  # seconds between keep-alives on /progress/stream
+# Each open /progress/stream holds a request thread until the job finishes. Per process; keep it below
+# gunicorn's --threads so pages can't take every thread. Pages turned away poll /progress instead.
+MAX_PROGRESS_STREAMS = int(os.environ.get("MAX_PROGRESS_STREAMS", 4))
+progress_streams = threading.BoundedSemaphore(max(1, MAX_PROGRESS_STREAMS))
+
+def new_job(fields):
+    now = time.time()
+    job = {
+        "status": "processing",
+        "progress": 20,
+        "message": "Processing started...",
+        "transcript": "",
+        "summary": "",
+        "created_at": now,
+        "updated_at": now,
+        "version": 0,
+        "transcript_resets": 0,  # bumped when the segments are emptied, see progress_stream
+    }
+    job.update(fields)
+    return job
+
+class MemoryJobStore:
+    shared = False
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.jobs = {}
+        self.segments = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)  # notified on every job update, for progress streams
+    
+    def create(self, job_id, job):
+        with self.lock:
+            self.prune(job["created_at"])
+            self.jobs[job_id] = job
+            self.segments[job_id] = []
+    
+    def update(self, job_id, fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            if "segments" in fields:
+                self.segments[job_id] = list(fields.pop("segments"))
+                if not self.segments[job_id]:
+                    job["transcript_resets"] = job.get("transcript_resets", 0) + 1
+            job.update(fields)
+            job["updated_at"] = time.time()
+            job["version"] += 1
+            self.changed.notify_all()
+    
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job, segment_count=len(self.segments[job_id])) if job is not None else None
+    
+    def append_segments(self, job_id, segments):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            self.segments[job_id].extend(segments)
+            job["transcript"] += "".join(segment["text"] for segment in segments)
+            job["updated_at"] = time.time()
+            job["version"] += 1
+            self.changed.notify_all()
+    
+    def get_segments(self, job_id, since):
+        with self.lock:
+            return self.segments[job_id][since:] if job_id in self.jobs else None
+    
+    def wait_for_change(self, job_id, version, timeout):
+        with self.changed:
+            self.changed.wait_for(lambda: job_id not in self.jobs or self.jobs[job_id]["version"] != version, timeout)
+    
+    def load_checkpoint(self, job_id, fingerprint):
+        return 0, []  # nothing outlives this process, so there is never anything to resume
+    
+    def save_checkpoint(self, job_id, fingerprint, position, segments):
+        pass
+    
+    def prune(self, now):
+        # Caller must hold the lock. Finished jobs are kept for the TTL so results can still be fetched.
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job["status"] in ("complete", "error") and now - job["updated_at"] > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+            del self.segments[job_id]
+
+class SqliteJobStore:
+    # Jobs in a SQLite database in WAL mode, so several gunicorn workers and worker processes on one host see
+    # the same jobs: any web worker answers /progress and /results, and queued jobs wait in the database until
+    # a process with a free extraction slot claims them (see JobClaimer). WAL needs shared memory, so the file
+    # must be on a local disk, not a network filesystem. A queued job's payload holds what the pipeline needs
+    # to run it, including the API key; it is cleared as soon as the job finishes.
+    # Claimers send heartbeats; the jobs of one that goes silent are queued again and resume from their
+    # transcription checkpoints (see TranscriptionCheckpoint).
+    shared = True
+    
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+        self.changed = threading.Condition()  # wakes this process's waiters early; other processes are polled
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self.db()
+        db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, version INTEGER NOT NULL,
+            created_at REAL NOT NULL, updated_at REAL NOT NULL, payload TEXT, claimed_by TEXT)""")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, claimed_by, created_at)")
+        db.execute("""CREATE TABLE IF NOT EXISTS segments (
+            job_id TEXT NOT NULL, position INTEGER NOT NULL, segment TEXT NOT NULL, PRIMARY KEY (job_id, position))""")
+        db.execute("""CREATE TABLE IF NOT EXISTS checkpoints (
+            job_id TEXT NOT NULL, fingerprint TEXT NOT NULL, position INTEGER NOT NULL, segments TEXT NOT NULL,
+            PRIMARY KEY (job_id, position))""")
+        db.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+    
+    def db(self):
+        # One connection per thread, and new ones after a fork (e.g. from the gunicorn master with preload_app)
+        db = getattr(self.local, "db", None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db, self.local.pid = db, os.getpid()
+        return db
+    
+    def transaction(self):
+        # Write lock up front, so read-modify-write updates from different processes can't interleave
+        db = self.db()
+        db.execute("BEGIN IMMEDIATE")
+        return db
+    
+    def notify(self):
+        with self.changed:
+            self.changed.notify_all()
+    
+    def create(self, job_id, job):
+        db = self.transaction()
+        try:
+            self.prune(db, job["created_at"])
+            db.execute("INSERT INTO jobs (id, status, data, version, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                       (job_id, job["status"], json.dumps(job), job["version"], job["created_at"], job["updated_at"]))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    
+    def update(self, job_id, fields):
+        db = self.transaction()
+        try:
+            row = db.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                db.execute("ROLLBACK")
+                return
+            job = json.loads(row[0])
+            if "segments" in fields:
+                segments = fields.pop("segments")
+                db.execute("DELETE FROM segments WHERE job_id = ?", (job_id,))
+                self.insert_segments(db, job_id, 0, segments)
+                if not segments:
+                    job["transcript_resets"] = job.get("transcript_resets", 0) + 1
+            job.update(fields)
+            job["updated_at"] = time.time()
+            job["version"] += 1
+            finished = job["status"] in ("complete", "error")
+            db.execute("""UPDATE jobs SET status = ?, data = ?, version = ?, updated_at = ?,
+                          payload = CASE WHEN ? THEN NULL ELSE payload END WHERE id = ?""",
+                       (job["status"], json.dumps(job), job["version"], job["updated_at"], finished, job_id))
+            if finished:
+                db.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.notify()
+    
+    def get(self, job_id):
+        row = self.db().execute("SELECT data, (SELECT COUNT(*) FROM segments WHERE job_id = id) FROM jobs WHERE id = ?",
+                                (job_id,)).fetchone()
+        return dict(json.loads(row[0]), segment_count=row[1]) if row is not None else None
+    
+    def insert_segments(self, db, job_id, start, segments):
+        db.executemany("INSERT INTO segments (job_id, position, segment) VALUES (?, ?, ?)",
+                       [(job_id, position, json.dumps({"start": segment["start"], "end": segment["end"],
+                                                       "text": segment["text"]}))
+                        for position, segment in enumerate(segments, start)])
+    
+    def append_segments(self, job_id, segments):
+        db = self.transaction()
+        try:
+            row = db.execute("SELECT data, (SELECT COUNT(*) FROM segments WHERE job_id = id) FROM jobs WHERE id = ?",
+                             (job_id,)).fetchone()
+            if row is None:
+                db.execute("ROLLBACK")
+                return
+            job = json.loads(row[0])
+            self.insert_segments(db, job_id, row[1], segments)
+            job["transcript"] += "".join(segment["text"] for segment in segments)
+            job["updated_at"] = time.time()
+            job["version"] += 1
+            db.execute("UPDATE jobs SET data = ?, version = ?, updated_at = ? WHERE id = ?",
+                       (json.dumps(job), job["version"], job["updated_at"], job_id))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.notify()
+    
+    def get_segments(self, job_id, since):
+        db = self.db()
+        if db.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone() is None:
+            return None
+        rows = db.execute("SELECT segment FROM segments WHERE job_id = ? AND position >= ? ORDER BY position",
+                          (job_id, since)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def wait_for_change(self, job_id, version, timeout):
+        deadline = time.time() + timeout
+        while True:
+            row = self.db().execute("SELECT version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            remaining = deadline - time.time()
+            if row is None or row[0] != version or remaining <= 0:
+                return
+            with self.changed:
+                self.changed.wait(min(JOB_POLL_INTERVAL, remaining))
+    
+    def prune(self, db, now):
+        # Inside a transaction. Finished jobs are kept for the TTL so results can still be fetched.
+        db.execute("DELETE FROM segments WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('complete', 'error') "
+                   "AND updated_at < ?)", (now - self.ttl,))
+        db.execute("DELETE FROM jobs WHERE status IN ('complete', 'error') AND updated_at < ?", (now - self.ttl,))
+        db.execute("DELETE FROM checkpoints WHERE job_id NOT IN (SELECT id FROM jobs)")
+    
+    def enqueue(self, job_id, payload):
+        self.db().execute("UPDATE jobs SET payload = ?, claimed_by = NULL WHERE id = ?", (json.dumps(payload), job_id))
+        self.notify()
+    
+    def set_payload(self, job_id, payload):
+        # While the job runs, e.g. once its upload has become a file; finished jobs keep none
+        self.db().execute("UPDATE jobs SET payload = ? WHERE id = ? AND payload IS NOT NULL", (json.dumps(payload), job_id))
+    
+    def load_checkpoint(self, job_id, fingerprint):
+        # (position, segments) of the windows completed so far, (0, []) if there are none
+        rows = self.db().execute("SELECT position, segments FROM checkpoints WHERE job_id = ? AND fingerprint = ? "
+                                 "ORDER BY position", (job_id, fingerprint)).fetchall()
+        return (rows[-1][0] if rows else 0), [segment for _, window in rows for segment in json.loads(window)]
+    
+    def save_checkpoint(self, job_id, fingerprint, position, segments):
+        db = self.transaction()
+        try:
+            # Windows of a pass with other settings (e.g. a changed model after a deploy) don't fit this one
+            db.execute("DELETE FROM checkpoints WHERE job_id = ? AND fingerprint != ?", (job_id, fingerprint))
+            db.execute("INSERT OR REPLACE INTO checkpoints (job_id, fingerprint, position, segments) VALUES (?, ?, ?, ?)",
+                       (job_id, fingerprint, position, json.dumps(segments)))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+    
+    def heartbeat(self, worker_id):
+        self.db().execute("INSERT OR REPLACE INTO workers (id, seen_at) VALUES (?, ?)", (worker_id, time.time()))
+    
+    def requeue_orphans(self, timeout):
+        # Jobs whose worker has sent no heartbeat for `timeout` seconds (crashed, OOM-killed, recycled or
+        # stopped by a deploy) go back to the queue. Returns their IDs.
+        now = time.time()
+        db = self.transaction()
+        try:
+            rows = db.execute("""SELECT id, data FROM jobs WHERE status NOT IN ('complete', 'error')
+                                 AND claimed_by IS NOT NULL AND payload IS NOT NULL
+                                 AND claimed_by NOT IN (SELECT id FROM workers WHERE seen_at >= ?)""",
+                              (now - timeout,)).fetchall()
+            for job_id, data in rows:
+                job = json.loads(data)
+                job.update(status="queued", progress=0, message="Waiting in queue to resume...", eta_seconds=None,
+                           resumed=True, updated_at=now, version=job["version"] + 1)
+                db.execute("UPDATE jobs SET status = ?, data = ?, version = ?, updated_at = ?, claimed_by = NULL WHERE id = ?",
+                           (job["status"], json.dumps(job), job["version"], now, job_id))
+            db.execute("DELETE FROM workers WHERE seen_at < ?", (now - timeout,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if rows:
+            self.notify()
+        return [job_id for job_id, _ in rows]
+    
+    def claim(self, worker_id):
+        # The oldest queued job nobody has taken yet, as (job_id, payload), or None
+        db = self.transaction()
+        try:
+            row = db.execute("""SELECT id, payload FROM jobs WHERE status = 'queued' AND claimed_by IS NULL
+                                AND payload IS NOT NULL ORDER BY created_at LIMIT 1""").fetchone()
+            if row is not None:
+                db.execute("UPDATE jobs SET claimed_by = ? WHERE id = ?", (worker_id, row[0]))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return (row[0], json.loads(row[1])) if row is not None else None
+    
+    def queued_count(self):
+        return self.db().execute("""SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND claimed_by IS NULL
+                                    AND payload IS NOT NULL""").fetchone()[0]
+    
+    def queue_position(self, job_id):
+        # 1-based position among the unclaimed jobs, 0 once a worker has taken it
+        row = self.db().execute("""SELECT COUNT(*) FROM jobs AS queued, jobs AS job WHERE job.id = ?
+                                   AND job.status = 'queued' AND job.claimed_by IS NULL AND job.payload IS NOT NULL
+                                   AND queued.status = 'queued' AND queued.claimed_by IS NULL
+                                   AND queued.payload IS NOT NULL AND queued.created_at <= job.created_at""",
+                                (job_id,)).fetchone()
+        return row[0]
+
+def create_job_store(backend):
+    if backend == "sqlite":
+        return SqliteJobStore(JOB_DB_PATH, JOB_TTL_SECONDS)
+    if backend != "memory":
+        print(f"Unknown JOB_STORE {backend!r}, using memory")
+    return MemoryJobStore(JOB_TTL_SECONDS)
+
+job_store = create_job_store(JOB_STORE)
+
+def create_job(**fields):
+    job_id = uuid.uuid4().hex
+    job_store.create(job_id, new_job(fields))
+    return job_id
+
+def update_job(job_id, **fields):
+    job_store.update(job_id, fields)
+
+def get_job(job_id):
+    # A copy of the job without its segments; segment_count says how many get_segments has
+    return job_store.get(job_id)
+
+def append_segments(job_id, segments):
+    # Publishes newly decoded segments; the transcript grows with them so /results is never behind
+    if segments:
+        job_store.append_segments(job_id, segments)
+
+def get_segments(job_id, since=0):
+    return job_store.get_segments(job_id, since)
+
+def wait_for_job_change(job_id, version, timeout):
+    # Blocks until the job's version moves past `version` (or the job disappears), at most `timeout` seconds
+    job_store.wait_for_change(job_id, version, timeout)
+
+# Processing pipeline: every job goes through extraction (FFmpeg), transcription (Whisper) and
+# summarization (Gemini), each stage with its own worker slots and bounded queue
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", 2))
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", 1))  # transcription slots
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", 8))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", 10))  # waiting for extraction; beyond that /process answers 503
+TRANSCRIBE_QUEUE_SIZE = int(os.environ.get("TRANSCRIBE_QUEUE_SIZE", 1))  # decoded recordings (held in memory) waiting for a slot
+JOB_DURATION_ESTIMATE = float(os.environ.get("JOB_DURATION_ESTIMATE", 120))  # initial guess for one transcription
+EXTRACT_DURATION_ESTIMATE = 10
+SUMMARY_DURATION_ESTIMATE = 15
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Server is busy, please try again later")
+        self.retry_after = retry_after
+
+# Time the current stage worker spent blocked handing its job on to the next stage
+stage_worker = threading.local()
+
+class JobScheduler:
+    # Worker slots in front of a bounded queue; one per pipeline stage
+    def __init__(self, name, slots, max_queued, duration_estimate):
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queued = max_queued
+        self.avg_duration = duration_estimate
+        self.pending = collections.deque()
+        self.reserved = 0  # queue spots held for jobs still being prepared (see reserve)
+        self.running = {}
+        self.cond = threading.Condition()
+        self.workers = []
+        self.started_at = None
+        self.busy_seconds = 0.0
+        self.completed = 0
+
+    def is_full(self):
+        with self.cond:
+            return len(self.pending) + self.reserved >= self.max_queued
+
+    def retry_after(self):
+        # Seconds until the head of the queue starts and frees a queue spot
+        with self.cond:
+            return self._start_times(1)[0]
+    
+    def has_free_slot(self):
+        with self.cond:
+            return len(self.running) + len(self.pending) < self.slots
+    
+    def start_time(self, position):
+        # Seconds until a job at this 1-based queue position would start
+        with self.cond:
+            return self._start_times(position)[-1]
+
+    def _wait_for_room(self, block):
+        # Caller must hold the lock. Reserved spots count as taken.
+        if len(self.pending) + self.reserved >= self.max_queued:
+            if not block:
+                raise QueueFullError(self._start_times(1)[0])
+            waiting_since = time.time()
+            self.cond.wait_for(lambda: len(self.pending) + self.reserved < self.max_queued)
+            stage_worker.blocked_seconds = getattr(stage_worker, "blocked_seconds", 0.0) + time.time() - waiting_since
+
+    def reserve(self):
+        # Waits for a queue spot and holds it while the job is prepared for this stage, so e.g. audio is only
+        # decoded once there is room for it. submit(reserved=True) uses the spot, release() gives it back.
+        with self.cond:
+            self._wait_for_room(True)
+            self.reserved += 1
+
+    def release(self):
+        with self.cond:
+            self.reserved -= 1
+            self.cond.notify_all()
+
+    def submit(self, job_id, target, args, block=False, reserved=False):
+        # block=True waits for room instead of raising QueueFullError. Stages hand jobs on this way, so a
+        # slow stage holds back the one before it and its queue stays bounded.
+        with self.cond:
+            if reserved:
+                self.reserved -= 1
+            else:
+                self._wait_for_room(block)
+            self.pending.append((job_id, target, args))
+            # Workers are started lazily so importing the app (e.g. in the gunicorn master) starts no threads
+            while len(self.workers) < self.slots:
+                worker = threading.Thread(target=self._worker, daemon=True, name=f"{self.name}-{len(self.workers)}")
+                worker.start()
+                self.workers.append(worker)
+                self.started_at = self.started_at or time.time()
+            self.cond.notify_all()
+
+    def queue_position(self, job_id):
+        # 1-based position in the queue, 0 if the job is not waiting
+        with self.cond:
+            for position, (pending_id, _, _) in enumerate(self.pending, 1):
+                if pending_id == job_id:
+                    return position
+            return 0
+
+    def eta(self, job_id):
+        # Estimated seconds until the job finishes, based on the running average job duration
+        with self.cond:
+            if job_id in self.running:
+                return max(0.0, self.avg_duration - (time.time() - self.running[job_id]))
+            for position, (pending_id, _, _) in enumerate(self.pending, 1):
+                if pending_id == job_id:
+                    return self._start_times(position)[-1] + self.avg_duration
+            return None
+
+    def _start_times(self, count):
+        # Simulate the slots draining: each queued job takes the slot that frees up first
+        now = time.time()
+        free_at = sorted(max(0.0, self.avg_duration - (now - started)) for started in self.running.values())
+        free_at += [0.0] * (self.slots - len(free_at))
+        starts = []
+        for _ in range(count):
+            start = free_at.pop(0)
+            starts.append(start)
+            free_at.append(start + self.avg_duration)
+            free_at.sort()
+        return starts
+
+    def stats(self):
+        # utilization: share of the slots' time spent working, not idle or blocked on the next stage
+        with self.cond:
+            now = time.time()
+            capacity = (now - self.started_at) * self.slots if self.started_at else 0
+            busy = self.busy_seconds + sum(now - started for started in self.running.values())
+            return {"slots": self.slots, "running": len(self.running), "queued": len(self.pending),
+                    "max_queued": self.max_queued, "completed": self.completed,
+                    "avg_seconds": round(self.avg_duration, 1),
+                    "utilization": round(min(1.0, busy / capacity), 3) if capacity else 0.0}
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                job_id, target, args = self.pending.popleft()
+                self.cond.notify_all()  # room in the queue for a blocked hand-off
+                started = time.time()
+                self.running[job_id] = started
+            stage_worker.blocked_seconds = 0.0
+            try:
+                target(*args)
+            except Exception as e:
+                print(f"Job {job_id} failed in {self.name} stage: {e}")
+            finally:
+                with self.cond:
+                    elapsed = time.time() - started
+                    del self.running[job_id]
+                    # The average includes blocked hand-offs: the slot is taken meanwhile, which is what queue ETAs need
+                    self.avg_duration = 0.8 * self.avg_duration + 0.2 * elapsed
+                    self.busy_seconds += elapsed - stage_worker.blocked_seconds
+                    self.completed += 1
+
+class Pipeline:
+    # Jobs go through the stages in order, so the next job's FFmpeg run and the previous job's summary
+    # overlap with the current transcription. New jobs enter, and are turned away when full, at the first stage.
+    def __init__(self, stages):
+        self.stages = stages
+
+    def is_full(self):
+        return self.stages[0].is_full()
+
+    def retry_after(self):
+        return self.stages[0].retry_after()
+
+    def submit(self, job_id, target, args):
+        self.stages[0].submit(job_id, target, args)
+
+    def queue_position(self, job_id):
+        return self.stages[0].queue_position(job_id)
+
+    def eta(self, job_id):
+        # Time left in the job's current stage plus the average time of the stages after it
+        for index, stage in enumerate(self.stages):
+            eta = stage.eta(job_id)
+            if eta is not None:
+                return eta + sum(later.avg_duration for later in self.stages[index + 1:])
+        return None
+
+    def wait_estimate(self, position):
+        # Seconds until a job at this position in the first stage's queue would finish
+        return self.stages[0].start_time(position) + sum(stage.avg_duration for stage in self.stages)
+    
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
+
+extract_stage = JobScheduler("extract", EXTRACT_WORKERS, MAX_QUEUED_JOBS, EXTRACT_DURATION_ESTIMATE)
+transcribe_stage = JobScheduler("transcribe", MAX_CONCURRENT_JOBS, TRANSCRIBE_QUEUE_SIZE, JOB_DURATION_ESTIMATE)
+summarize_stage = JobScheduler("summarize", SUMMARY_WORKERS, MAX_QUEUED_JOBS, SUMMARY_DURATION_ESTIMATE)
+scheduler = Pipeline([extract_stage, transcribe_stage, summarize_stage])
+
+class JobClaimer:
+    # With a shared job store, queued jobs wait in the database instead of in one process's pipeline.
+    # Every process with PROCESS_JOBS=1 runs a claimer that takes the oldest one whenever its extraction
+    # stage has a free slot, so jobs go to whichever web worker or `python app.py worker` has room.
+    def __init__(self, store, stage):
+        self.store = store
+        self.stage = stage
+        self.cond = threading.Condition()
+        self.thread = None
+        self.pid = None
+    
+    def start(self):
+        # Idempotent; started lazily, and again after a fork since threads don't survive it
+        with self.cond:
+            if not self.store.shared or not PROCESS_JOBS or (self.thread is not None and self.pid == os.getpid()):
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, daemon=True, name="job-claimer")
+            self.thread.start()
+    
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+    
+    def run(self):
+        # The random part keeps a restarted process with the same PID (e.g. PID 1 in a container) from
+        # passing for its predecessor, whose jobs have to be taken over
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        print(f"Claiming jobs from {self.store.path} as {worker_id}")
+        last_heartbeat = 0
+        while True:
+            claimed = None
+            try:
+                if time.time() - last_heartbeat >= WORKER_HEARTBEAT_SECONDS:
+                    self.store.heartbeat(worker_id)
+                    for job_id in self.store.requeue_orphans(WORKER_TIMEOUT_SECONDS):
+                        print(f"Job {job_id} lost its worker, queued again")
+                    last_heartbeat = time.time()
+                if self.stage.has_free_slot():
+                    claimed = self.store.claim(worker_id)
+            except sqlite3.Error as e:
+                print(f"Claiming a job failed: {e}")
+            if claimed is not None:
+                job_id, ctx = claimed
+                print(f"Claimed job {job_id}")
+                self.stage.submit(job_id, extract_step, (ctx,), block=True)
+                continue
+            with self.cond:
+                self.cond.wait(JOB_POLL_INTERVAL)
+
+job_claimer = JobClaimer(job_store, extract_stage)
+
+def queue_is_full():
+    if job_store.shared:
+        return job_store.queued_count() >= MAX_QUEUED_JOBS
+    return scheduler.is_full()
+
+def queue_retry_after():
+    if job_store.shared:
+        return extract_stage.start_time(1)
+    return scheduler.retry_after()
+
+def enqueue_job(ctx):
+    # Raises QueueFullError when there is no room
+    if not job_store.shared:
+        scheduler.submit(ctx["job_id"], extract_step, (ctx,))
+        return
+    if queue_is_full():
+        raise QueueFullError(queue_retry_after())
+    job_store.enqueue(ctx["job_id"], job_payload(ctx))
+    job_claimer.start()
+    job_claimer.wake()
+
+def queue_position(job_id):
+    if job_store.shared:
+        return job_store.queue_position(job_id)
+    return scheduler.queue_position(job_id)
+
+def job_eta(job_id):
+    # Only this process's stages know their running jobs; shared-queue jobs are estimated from the
+    # local averages as if this process would take them
+    eta = scheduler.eta(job_id)
+    if eta is None and job_store.shared:
+        position = job_store.queue_position(job_id)
+        if position:
+            eta = scheduler.wait_estimate(position)
+    return eta
+
+# Transcript cache: one JSON file per (media hash, model, decode options), evicted least recently used first
+class TranscriptCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, content_hash, model_name, options):
+        return hashlib.sha256(json.dumps([content_hash, model_name, options], sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        if self.max_bytes <= 0:
+            return None
+        path = os.path.join(self.directory, key + ".json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        if self.max_bytes <= 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            "text": result["text"],
+            "segments": [{"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                         for segment in result.get("segments", [])],
+        }
+        # Write to a temp file first so other workers never read a half-written entry
+        path = os.path.join(self.directory, key + ".json")
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+
+    def contains(self, key):
+        # Existence check that doesn't count as a hit or refresh the entry
+        return self.max_bytes > 0 and os.path.exists(os.path.join(self.directory, key + ".json"))
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+transcript_cache = TranscriptCache(os.path.join(CACHE_DIR, "transcripts"), TRANSCRIPT_CACHE_MAX_BYTES)
+
+# Summary cache: memoizes LLM summaries with a TTL on top of an LRU backend.
+# The disk backend lets all gunicorn workers on a host share results.
+class MemorySummaryBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, summary):
+        with self.lock:
+            self.entries[key] = (summary, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+class DiskSummaryBackend:
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def get(self, key):
+        path = os.path.join(self.directory, key + ".json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return entry["summary"], entry["created_at"]
+
+    def set(self, key, summary):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key + ".json")
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "created_at": time.time()}, f)
+        os.replace(temp_path, path)
+        
+        names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        if len(names) > self.max_entries:
+            by_mtime = []
+            for name in names:
+                try:
+                    by_mtime.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+                except OSError:
+                    pass
+            for _, name in sorted(by_mtime)[:len(by_mtime) - self.max_entries]:
+                self.delete(name[:-len(".json")])
+
+    def delete(self, key):
+        try:
+            os.remove(os.path.join(self.directory, key + ".json"))
+        except OSError:
+            pass
+
+class SummaryCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, transcript, summary_length, summary_format, model):
+        return hashlib.sha256(json.dumps([transcript, summary_length, summary_format, model]).encode()).hexdigest()
+
+    def get(self, key, count=True):
+        # count=False for lookups that are not a user's request, so they don't skew the hit rate
+        entry = self.backend.get(key) if self.backend is not None else None
+        if entry is not None and time.time() - entry[1] > self.ttl:
+            self.backend.delete(key)
+            entry = None
+        if count:
+            with self.lock:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        return entry[0] if entry is not None else None
+
+    def set(self, key, summary):
+        if self.backend is not None:
+            self.backend.set(key, summary)
+
+    def stats(self):
+        with self.lock:
+            return {"backend": SUMMARY_CACHE_BACKEND, "hits": self.hits, "misses": self.misses}
+
+def create_summary_backend(name):
+    if name == "memory":
+        return MemorySummaryBackend(SUMMARY_CACHE_MAX_ENTRIES)
+    if name == "disk":
+        return DiskSummaryBackend(os.path.join(CACHE_DIR, "summaries"), SUMMARY_CACHE_MAX_ENTRIES)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown SUMMARY_CACHE_BACKEND: {name}")
+
+summary_cache = SummaryCache(create_summary_backend(SUMMARY_CACHE_BACKEND), SUMMARY_CACHE_TTL)
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        # Caller must hold the lock
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        # Tokens left right now, without taking one
+        with self.lock:
+            self._refill()
+            return self.tokens
+
+    def acquire(self):
+        # Blocks until a token is available and returns the seconds spent waiting
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class GeminiMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "in_flight": 0, "retries": 0, "failures": 0,
+                         "rate_limit_wait_seconds": 0.0, "slot_wait_seconds": 0.0, "retry_wait_seconds": 0.0}
+
+    def add(self, **amounts):
+        with self.lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def stats(self):
+        with self.lock:
+            return {name: round(value, 3) for name, value in self.counters.items()}
+
+gemini_metrics = GeminiMetrics()
+gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_IN_FLIGHT)
+
+def is_retryable(error):
+    # google-genai's APIError carries the HTTP status in .code
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code in RETRYABLE_STATUS_CODES or isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # Dropped connections and timeouts in google-genai's HTTP client (ConnectError, ReadTimeout,
+    # RemoteProtocolError, ...) don't derive from the builtin exceptions
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+class PooledModels:
+    def __init__(self, pooled_client):
+        self.pooled_client = pooled_client
+
+    def generate_content(self, **kwargs):
+        return self.pooled_client.call(lambda: self.pooled_client.client.models.generate_content(**kwargs))
+
+class PooledClient:
+    # Same models.generate_content() interface as genai.Client, so callers don't know the difference
+    def __init__(self, api_key):
+        self.client = genai.Client(api_key=api_key)
+        self.bucket = TokenBucket(GEMINI_REQUESTS_PER_MINUTE / 60, GEMINI_BURST)
+        self.models = PooledModels(self)
+
+    def call(self, request):
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            gemini_metrics.add(rate_limit_wait_seconds=self.bucket.acquire())
+            started = time.monotonic()
+            gemini_slots.acquire()
+            gemini_metrics.add(requests=1, in_flight=1, slot_wait_seconds=time.monotonic() - started)
+            try:
+                return request()
+            except Exception as e:
+                if attempt == GEMINI_MAX_RETRIES or not is_retryable(e):
+                    gemini_metrics.add(failures=1)
+                    raise
+                # Exponential backoff with full jitter so retries from many jobs don't line up
+                delay = random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+                gemini_metrics.add(retries=1, retry_wait_seconds=delay)
+                print(f"Gemini request failed ({e}), retrying in {delay:.1f} s...")
+            finally:
+                gemini_metrics.add(in_flight=-1)
+                gemini_slots.release()
+            time.sleep(delay)
+
+    def has_spare_capacity(self, requests):
+        # Whether `requests` more could start right away and still leave a request's worth of this key's
+        # rate limit and of the global slots to other callers. For background work users don't wait for.
+        # More requests than the burst or the slots allow are paced by them anyway, so at most that many
+        # have to be free.
+        tokens = min(requests + 1, GEMINI_BURST)
+        slots = min(requests, SUMMARY_MAX_IN_FLIGHT, GEMINI_MAX_IN_FLIGHT - 1)
+        return (self.bucket.available() >= tokens
+                and gemini_metrics.stats()["in_flight"] + slots < GEMINI_MAX_IN_FLIGHT)
+
+class GeminiClientPool:
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.clients = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, api_key):
+        with self.lock:
+            client = self.clients.get(api_key)
+            if client is None:
+                client = PooledClient(api_key)
+                self.clients[api_key] = client
+            self.clients.move_to_end(api_key)
+            while len(self.clients) > self.max_keys:
+                self.clients.popitem(last=False)
+            return client
+
+gemini_pool = GeminiClientPool(GEMINI_POOL_SIZE)
+
+def save_upload(file_storage, path):
+    # Stream the upload to disk and hash it on the way, so the content hash costs no extra read
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        while True:
+            chunk = file_storage.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+class UploadStalledError(Exception):
+    pass
+
+class UploadOffsetError(Exception):
+    def __init__(self, offset):
+        super().__init__(f"Upload continues at byte {offset}")
+        self.offset = offset
+
+class UploadStore:
+    # Chunked uploads: the client creates an upload with its size, then PUTs consecutive byte ranges that
+    # are appended to a file of their own. After a dropped connection it asks for the stored offset and
+    # continues from there. The state lives next to the data (<id>.json), so any worker can pick an upload
+    # up; the running hash is kept in memory and a worker without it rehashes the stored bytes once.
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)  # new data arrived (in this process)
+        self.digests = {}  # upload_id -> (offset, running sha256)
+
+    def scratch_path(self, name, filename):
+        # Unique file per upload or job. The extension is kept, it helps FFmpeg with a few formats.
+        os.makedirs(self.directory, exist_ok=True)
+        extension = os.path.splitext(filename or "")[1].lower()
+        if not re.fullmatch(r"\.[a-z0-9]{1,8}", extension):
+            extension = ""
+        return os.path.join(self.directory, name + extension)
+
+    def create(self, filename, size):
+        self.prune(time.time())
+        upload_id = uuid.uuid4().hex
+        meta = {"filename": filename, "size": size, "path": self.scratch_path(upload_id, filename), "sha256": None}
+        open(meta["path"], "wb").close()
+        self.save(upload_id, meta)
+        return upload_id
+
+    def save(self, upload_id, meta):
+        path = os.path.join(self.directory, upload_id + ".json")
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({key: meta.get(key) for key in ("filename", "size", "path", "sha256", "job_id")}, f)
+        os.replace(temp_path, path)
+
+    def status(self, upload_id):
+        # The upload's metadata plus the number of bytes stored so far, or None for unknown uploads
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, upload_id + ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            meta["offset"] = os.path.getsize(meta["path"])
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    @contextlib.contextmanager
+    def upload_lock(self, upload_id):
+        # An flock on <id>.lock, so changes to one upload are serialized across threads and across the
+        # gunicorn workers sharing the folder; two workers appending at once would interleave their data
+        with open(os.path.join(self.directory, upload_id + ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def running_digest(self, upload_id, meta):
+        offset, digest = self.digests.get(upload_id, (None, None))
+        if offset == meta["offset"]:
+            return digest
+        digest = hashlib.sha256()
+        with open(meta["path"], "rb") as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest
+
+    def append(self, upload_id, offset, stream):
+        # Appends the request body at `offset`, which must be where the stored data ends. Returns the
+        # updated metadata; sha256 is set once the declared size has arrived.
+        if self.status(upload_id) is None:
+            raise KeyError(upload_id)
+        with self.upload_lock(upload_id):
+            meta = self.status(upload_id)
+            if meta is None:
+                raise KeyError(upload_id)
+            if offset != meta["offset"] or meta["sha256"] is not None:
+                raise UploadOffsetError(meta["offset"])
+            digest = self.running_digest(upload_id, meta)
+            received = meta["offset"]
+            try:
+                # Written at the checked offset rather than appended, so the data lands where it belongs
+                with open(meta["path"], "r+b") as f:
+                    f.seek(received)
+                    while True:
+                        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        if received + len(chunk) > meta["size"]:
+                            raise ValueError("More data than the declared upload size")
+                        f.write(chunk)
+                        f.flush()
+                        digest.update(chunk)
+                        received += len(chunk)
+                        with self.changed:
+                            self.changed.notify_all()
+            finally:
+                # Also after a dropped connection: whatever was stored is where the next request continues
+                with self.lock:
+                    self.digests[upload_id] = (received, digest)
+            meta["offset"] = received
+            if received == meta["size"]:
+                meta["sha256"] = digest.hexdigest()
+                self.save(upload_id, meta)
+                with self.lock:
+                    self.digests.pop(upload_id, None)
+            return meta
+
+    def claim(self, upload_id, job_id):
+        # Records the job that processes the upload while it is still arriving
+        with self.upload_lock(upload_id):
+            meta = self.status(upload_id)
+            if meta is not None:
+                meta["job_id"] = job_id
+                self.save(upload_id, meta)
+
+    def wait_for(self, upload_id, min_bytes=None, stall_seconds=None):
+        # Blocks until at least min_bytes are stored (None: until the upload is complete) and returns the
+        # metadata. Data written by other workers is noticed by polling. Raises UploadStalledError after
+        # stall_seconds (default: the TTL) without new data.
+        last_offset, last_change = None, time.time()
+        while True:
+            meta = self.status(upload_id)
+            if meta is None:
+                raise Exception("The upload was removed")
+            if meta["sha256"] is not None or (min_bytes is not None and meta["offset"] >= min_bytes):
+                return meta
+            if meta["offset"] != last_offset:
+                last_offset, last_change = meta["offset"], time.time()
+            elif time.time() - last_change > (stall_seconds or self.ttl):
+                raise UploadStalledError("The upload stopped before it was complete")
+            with self.changed:
+                self.changed.wait(1)
+
+    def follow(self, upload_id, stall_seconds=None):
+        # Yields the upload's bytes in order as they arrive, until the upload is complete
+        meta = self.wait_for(upload_id, 1, stall_seconds)
+        position = 0
+        with open(meta["path"], "rb") as f:
+            while True:
+                chunk = f.read(UPLOAD_CHUNK_SIZE)
+                if chunk:
+                    position += len(chunk)
+                    yield chunk
+                    continue
+                meta = self.wait_for(upload_id, position + 1, stall_seconds)
+                if meta["sha256"] is not None and meta["offset"] == position:
+                    return
+
+    def take(self, upload_id):
+        # Hands a finished upload over to a job, which deletes the file when it is done. Returns the
+        # metadata, or None if the upload is unknown or incomplete.
+        with self.upload_lock(upload_id):
+            meta = self.status(upload_id)
+            if meta is None or meta["sha256"] is None:
+                return None
+            os.remove(os.path.join(self.directory, upload_id + ".json"))
+            self.remove_lock_file(upload_id)
+        return meta
+
+    def remove_lock_file(self, upload_id):
+        # Only once <id>.json is gone: whoever takes the lock afterwards finds the upload unknown
+        try:
+            os.remove(os.path.join(self.directory, upload_id + ".lock"))
+        except OSError:
+            pass
+
+    def prune(self, now):
+        # Removes uploads that haven't received data for `ttl` seconds
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[:-5]
+            meta = self.status(upload_id)
+            try:
+                last_write = os.path.getmtime(meta["path"] if meta else os.path.join(self.directory, name))
+                if now - last_write > self.ttl:
+                    if meta:
+                        os.remove(meta["path"])
+                    os.remove(os.path.join(self.directory, name))
+                    self.remove_lock_file(upload_id)
+                    with self.lock:
+                        self.digests.pop(upload_id, None)
+            except OSError:
+                pass
+
+upload_store = UploadStore(UPLOAD_DIR, UPLOAD_TTL_SECONDS)
+
+def busy_response(retry_after):
+    retry_after = max(1, int(retry_after))
+    response = jsonify({"success": False, "error": "Server is busy, please try again later", "retry_after": retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(retry_after)
+    return response
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -241,7 +1550,13 @@ HTML_TEMPLATE = """
     </div>
 
     <script>
-        let processingInterval;
+        let progressSource = null;
+        let progressTimer = null;
+        let currentJobId = null;
+        let shownTier = '';
+        let shownSummaryTier = '';
+        let streamedTranscript = false;  // the transcript's segments arrive over the progress stream
+        let loadedTranscript = null;  // as loaded from the server, to tell whether the user edited it
         
         // Load saved API key on page load
         window.addEventListener('load', function() {
@@ -318,7 +1633,84 @@ HTML_TEMPLATE = """
             });
         }
         
-        function processVideo() {
+        const UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024;
+        const HASH_CHECK_MAX_BYTES = 256 * 1024 * 1024;  // hashing in the browser reads the whole file into memory
+        
+        const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+        
+        async function fileHash(file) {
+            // sha256 of small files, so the server can tell whether it already has the transcript
+            if (file.size > HASH_CHECK_MAX_BYTES || !window.crypto || !crypto.subtle) {
+                return null;
+            }
+            const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+            return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+        }
+        
+        async function uploadFile(file, onFirstChunk) {
+            // Sends the file in chunks; after a network error it asks the server how much arrived and
+            // continues from there. The upload id is remembered, so reloading the page resumes too.
+            // onFirstChunk(uploadId) runs once the first chunk is stored and more are still to come.
+            const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+            let uploadId = localStorage.getItem(resumeKey);
+            let offset = 0;
+            if (uploadId) {
+                const response = await fetch(`/uploads/${uploadId}`);
+                if (response.ok) {
+                    offset = (await response.json()).offset;
+                } else {
+                    uploadId = null;
+                }
+            }
+            if (!uploadId) {
+                const response = await fetch('/uploads', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ filename: file.name, size: file.size })
+                });
+                const data = await response.json();
+                if (!data.success) {
+                    throw new Error(data.error);
+                }
+                uploadId = data.upload_id;
+                localStorage.setItem(resumeKey, uploadId);
+            }
+            
+            let failures = 0;
+            while (offset < file.size) {
+                if (offset > 0 && onFirstChunk) {
+                    await onFirstChunk(uploadId);
+                    onFirstChunk = null;
+                }
+                if (!currentJobId) {
+                    updateStatus(`Uploading... ${Math.floor(100 * offset / file.size)}%`, 'processing', Math.floor(10 * offset / file.size));
+                }
+                try {
+                    const response = await fetch(`/uploads/${uploadId}?offset=${offset}`, {
+                        method: 'PUT',
+                        body: file.slice(offset, offset + UPLOAD_CHUNK_BYTES)
+                    });
+                    const data = await response.json();
+                    if (data.offset === undefined) {
+                        throw new Error(data.error);
+                    }
+                    offset = data.offset;  // on 409 the server says where to continue
+                    failures = 0;
+                } catch (error) {
+                    if (++failures > 5) {
+                        throw error;
+                    }
+                    await sleep(1000 * 2 ** failures);
+                    const response = await fetch(`/uploads/${uploadId}`).catch(() => null);
+                    if (response && response.ok) {
+                        offset = (await response.json()).offset;
+                    }
+                }
+            }
+            return { uploadId, resumeKey };
+        }
+        
+        async function processVideo() {
             const fileInput = document.getElementById('videoFile');
             const apiKey = document.getElementById('apiKey').value;
             const summaryLength = document.querySelector('input[name="summaryLength"]:checked').value;
@@ -334,8 +1726,8 @@ HTML_TEMPLATE = """
                 return;
             }
             
+            const file = fileInput.files[0];
             const formData = new FormData();
-            formData.append('video', fileInput.files[0]);
             formData.append('api_key', apiKey);
             formData.append('summary_length', summaryLength);
             formData.append('summary_format', summaryFormat);
@@ -344,56 +1736,166 @@ HTML_TEMPLATE = """
             document.getElementById('transcript').value = '';
             document.getElementById('summary').value = '';
             
-            updateStatus('Starting processing...', 'processing', 10);
+            updateStatus('Starting processing...', 'processing', 0);
             
-            fetch('/process', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    // Start polling for progress
-                    processingInterval = setInterval(checkProgress, 1000);
+            currentJobId = null;
+            try {
+                // Skip the transfer when the server already has the transcript of this exact file
+                const hash = await fileHash(file);
+                const known = hash && (await (await fetch(`/uploads/known/${hash}`)).json()).known;
+                if (known) {
+                    formData.append('content_hash', hash);
+                    await startProcessing(formData);
                 } else {
-                    updateStatus('Error: ' + data.error, 'error', 0);
-                    document.getElementById('processBtn').disabled = false;
+                    // Processing starts after the first chunk, so the server decodes while the rest uploads
+                    const upload = await uploadFile(file, uploadId => {
+                        formData.append('upload_id', uploadId);
+                        return startProcessing(formData);
+                    });
+                    if (!formData.has('upload_id')) {
+                        formData.append('upload_id', upload.uploadId);
+                    }
+                    if (currentJobId || await startProcessing(formData)) {
+                        localStorage.removeItem(upload.resumeKey);
+                    }
                 }
-            })
-            .catch(error => {
-                updateStatus('Error starting process', 'error', 0);
+            } catch (error) {
+                updateStatus('Upload failed: ' + error.message, 'error', 0);
                 document.getElementById('processBtn').disabled = false;
+            }
+        }
+        
+        async function startProcessing(formData) {
+            // Returns whether a job was started; errors are shown in the status line
+            try {
+                const response = await fetch('/process', { method: 'POST', body: formData });
+                const data = await response.json();
+                if (data.success) {
+                    // Listen for progress updates of this job
+                    currentJobId = data.job_id;
+                    shownTier = shownSummaryTier = '';
+                    watchProgress();
+                    return true;
+                }
+                updateStatus('Error: ' + data.error, 'error', 0);
+            } catch (error) {
+                updateStatus('Error starting process', 'error', 0);
+            }
+            document.getElementById('processBtn').disabled = false;
+            return false;
+        }
+        
+        function watchProgress() {
+            // The server pushes a message whenever the job changes
+            progressSource = new EventSource(`/progress/stream/${currentJobId}`);
+            streamedTranscript = true;
+            progressSource.onopen = () => {
+                // Every (re)connection sends the segments from the start
+                document.getElementById('transcript').value = '';
+                loadedTranscript = '';
+            };
+            progressSource.onmessage = event => handleProgress(JSON.parse(event.data));
+            progressSource.addEventListener('reset', () => {
+                // The transcription started over, e.g. on another worker after this one was lost; its segments
+                // follow from the start, and the summary is made again from the new transcript
+                document.getElementById('transcript').value = '';
+                document.getElementById('summary').value = '';
+                loadedTranscript = '';
+                shownTier = shownSummaryTier = '';
+            });
+            progressSource.addEventListener('segments', event => {
+                // Transcript text arrives piece by piece while Whisper is still running
+                const transcriptEl = document.getElementById('transcript');
+                const text = JSON.parse(event.data).map(segment => segment.text).join('');
+                transcriptEl.value += text;
+                loadedTranscript += text;
+                transcriptEl.scrollTop = transcriptEl.scrollHeight;
             });
+            progressSource.onerror = () => {
+                // The browser reconnects by itself unless the server refused the stream, e.g. because it has
+                // no stream to spare; then ask for the status every few seconds instead
+                if (progressSource.readyState === EventSource.CLOSED) {
+                    stopProgress();
+                    pollProgress();
+                }
+            };
+        }
+        
+        function pollProgress() {
+            // Without the stream the transcript is loaded from /results once it is ready
+            streamedTranscript = false;
+            progressTimer = setInterval(() => {
+                fetch(`/progress/${currentJobId}`)
+                .then(response => {
+                    if (response.status === 404) {
+                        stopProgress();
+                        document.getElementById('processBtn').disabled = false;
+                        updateStatus('Lost connection to the server', 'error', 0);
+                        return;
+                    }
+                    if (response.ok) {
+                        return response.json().then(handleProgress);
+                    }
+                })
+                .catch(() => {});  // a network hiccup: try again on the next tick
+            }, 2000);
+        }
+        
+        function stopProgress() {
+            if (progressSource) {
+                progressSource.close();
+                progressSource = null;
+            }
+            if (progressTimer) {
+                clearInterval(progressTimer);
+                progressTimer = null;
+            }
         }
         
-        function checkProgress() {
-            fetch('/progress')
+        function showResults(data) {
+            // Loads only what changed: the transcript when it wasn't streamed or the refined one replaced the
+            // streamed draft, otherwise just the summary
+            const tier = data.tier || '';
+            const summaryTier = data.summary_tier || '';
+            const transcriptChanged = tier !== shownTier && (shownTier === 'draft' || !streamedTranscript);
+            const summaryChanged = summaryTier !== shownSummaryTier;
+            shownTier = tier;
+            shownSummaryTier = summaryTier;
+            if (!transcriptChanged && !summaryChanged) {
+                return Promise.resolve();
+            }
+            return fetch(`/results/${currentJobId}` + (transcriptChanged ? '' : '?fields=summary'))
             .then(response => response.json())
-            .then(data => {
-                updateStatus(data.message, data.status === 'error' ? 'error' : 'processing', data.progress);
-                
-                if (data.status === 'complete') {
-                    clearInterval(processingInterval);
-                    document.getElementById('processBtn').disabled = false;
-                    updateStatus('Processing complete!', 'complete', 100);
-                    
-                    // Get results
-                    fetch('/results')
-                    .then(response => response.json())
-                    .then(results => {
-                        document.getElementById('transcript').value = results.transcript;
-                        document.getElementById('summary').value = results.summary;
-                        
-                        // Enable regenerate button after transcript is complete
-                        document.getElementById('regenerateBtn').disabled = false;
-                    });
-                } else if (data.status === 'error') {
-                    clearInterval(processingInterval);
-                    document.getElementById('processBtn').disabled = false;
+            .then(results => {
+                if (transcriptChanged) {
+                    document.getElementById('transcript').value = results.transcript;
+                    loadedTranscript = results.transcript;
                 }
+                document.getElementById('summary').value = results.summary;
             });
         }
         
+        function handleProgress(data) {
+            updateStatus(data.message, data.status === 'error' ? 'error' : 'processing', data.progress);
+            
+            if (data.status === 'processing' && data.tier) {
+                // A draft transcript or summary is ready; show it until the refined one replaces it
+                showResults(data);
+            } else if (data.status === 'complete') {
+                stopProgress();
+                document.getElementById('processBtn').disabled = false;
+                updateStatus('Processing complete!', 'complete', 100);
+                
+                // Get results, then enable the regenerate button now that the transcript is complete
+                showResults(data).then(() => {
+                    document.getElementById('regenerateBtn').disabled = false;
+                });
+            } else if (data.status === 'error') {
+                stopProgress();
+                document.getElementById('processBtn').disabled = false;
+            }
+        }
+        
         function regenerateSummary() {
             const apiKey = document.getElementById('apiKey').value;
             const summaryLength = document.querySelector('input[name="summaryLength"]:checked').value;
@@ -416,17 +1918,21 @@ HTML_TEMPLATE = """
             
             updateStatus('Regenerating summary...', 'processing', 50);
             
-            fetch('/regenerate_summary', {
+            // The server has the job's transcript; it is only sent when it was edited (or the job expired)
+            const send = withTranscript => fetch('/regenerate_summary', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
+                    job_id: currentJobId,
                     api_key: apiKey,
                     summary_length: summaryLength,
                     summary_format: summaryFormat,
-                    transcript: transcript
+                    transcript: withTranscript ? transcript : undefined
                 })
-            })
-            .then(response => response.json())
+            }).then(response => response.json());
+            
+            send(!currentJobId || transcript !== loadedTranscript)
+            .then(data => data.transcript_required ? send(true) : data)
             .then(data => {
                 if (data.success) {
                     document.getElementById('summary').value = data.summary;
@@ -493,6 +1999,7 @@ HTML_TEMPLATE = """
             document.getElementById('summary').value = '';
             document.getElementById('fileName').textContent = '';
             document.getElementById('regenerateBtn').disabled = true;
+            currentJobId = null;
             updateStatus('Ready', 'ready', 0);
         }
     </script>
@@ -500,6 +2007,11 @@ HTML_TEMPLATE = """
 </html>
 """
 
+@app.before_request
+def start_job_claimer():
+    # With a shared job store, every web worker also takes jobs from its first request on (see JobClaimer)
+    job_claimer.start()
+
 @app.route('/')
 def index():
     return render_template_string(HTML_TEMPLATE)
@@ -510,9 +2022,9 @@ def test_api():
         data = request.json
         api_key = data.get('api_key')
         
-        client = genai.Client(api_key=api_key)
+        client = gemini_pool.get(api_key)
         response = client.models.generate_content(
-            model="gemini-2.5-flash",
+            model=SUMMARY_MODEL,
             contents="Hello, this is a test. Please respond with 'API key works!'"
         )
         
@@ -522,258 +2034,1483 @@ def test_api():
 
 @app.route('/process', methods=['POST'])
 def process():
+    # The video comes as a finished chunked upload (upload_id), as a multipart file (video), or not at all
+    # when the client only sends the hash of a file whose transcript is cached (content_hash)
     try:
-        global processing_status, current_transcript, current_summary
-        
-        video_file = request.files['video']
         api_key = request.form['api_key']
         summary_length = request.form['summary_length']
         summary_format = request.form['summary_format']
+        upload_id = request.form.get('upload_id')
+        video_file = request.files.get('video')
+        content_hash = request.form.get('content_hash', '').lower()
         
-        # Reset status
-        processing_status = {"status": "processing", "progress": 20, "message": "Processing started..."}
-        current_transcript = ""
-        current_summary = ""
+        # Reject before saving the upload when there is no room in the queue
+        if queue_is_full():
+            return busy_response(queue_retry_after())
         
-        # Save uploaded file
-        temp_dir = tempfile.gettempdir()
-        video_path = os.path.join(temp_dir, video_file.filename)
-        video_file.save(video_path)
+        upload = None
+        video_path = None
+        if upload_id:
+            upload = upload_store.status(upload_id)
+            if upload is None:
+                return jsonify({"success": False, "error": "Upload not found"}), 400
+            job = get_job(upload["job_id"]) if upload.get("job_id") else None
+            if job is not None and job["status"] != "error":
+                # Asked again, e.g. after a page reload: the upload's job is already running
+                return jsonify({"success": True, "job_id": upload["job_id"]})
+            if upload["sha256"] is None:
+                return start_upload_job(upload_id, api_key, summary_length, summary_format)
+            upload = upload_store.take(upload_id)
+            if upload is None:
+                return jsonify({"success": False, "error": "Upload not found"}), 400
+            video_path, content_hash, filename = upload["path"], upload["sha256"], upload["filename"]
+        elif video_file:
+            filename = video_file.filename
+            video_path = upload_store.scratch_path(uuid.uuid4().hex, filename)
+            content_hash = save_upload(video_file, video_path)
+        elif content_hash:
+            if not transcript_cache.contains(transcript_cache.key(content_hash, MODEL_ID, TRANSCRIPT_OPTIONS)):
+                return jsonify({"success": False, "error": "Unknown file, please upload it"}), 404
+        else:
+            return jsonify({"success": False, "error": "No video uploaded"}), 400
         
-        # Start processing in background thread
-        thread = threading.Thread(target=process_video_thread, args=(video_path, api_key, summary_length, summary_format))
-        thread.daemon = True
-        thread.start()
+        job_id = create_job(status="queued", progress=0, message="Waiting in queue...")
         
-        return jsonify({"success": True})
+        # A few milliseconds of ffprobe spare a queue slot for files FFmpeg would fail on anyway
+        media = None
+        if video_path:
+            try:
+                media = probe_media(video_path)
+            except UnsupportedMediaError as e:
+                update_job(job_id, status="error", progress=0, message=f"Error: {e}")
+                os.remove(video_path)
+                return jsonify({"success": False, "error": str(e)}), 400
+            if media:
+                print(f"Probed {filename}: {media}")
+        
+        # Queue processing on the pipeline's worker threads, or in the shared job store
+        try:
+            enqueue_job(job_context(job_id, api_key, summary_length, summary_format, video_path, content_hash, media))
+        except QueueFullError as e:
+            update_job(job_id, status="error", progress=0, message=str(e))
+            if upload is not None:
+                upload_store.save(upload_id, upload)  # keep it, so the client can retry without uploading again
+            elif video_path and os.path.exists(video_path):
+                os.remove(video_path)
+            return busy_response(e.retry_after)
+        
+        return jsonify({"success": True, "job_id": job_id})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/progress')
-def progress():
-    return jsonify(processing_status)
+def start_upload_job(upload_id, api_key, summary_length, summary_format):
+    # Processing starts while the upload is still arriving (see wait_for_upload)
+    job_id = create_job(status="queued", progress=0, message="Waiting in queue...")
+    upload_store.claim(upload_id, job_id)
+    try:
+        enqueue_job(job_context(job_id, api_key, summary_length, summary_format, upload_id=upload_id))
+    except QueueFullError as e:
+        update_job(job_id, status="error", progress=0, message=str(e))
+        return busy_response(e.retry_after)
+    return jsonify({"success": True, "job_id": job_id})
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    try:
+        size = int(data["size"])
+    except (KeyError, TypeError, ValueError):
+        size = 0
+    if size <= 0:
+        return jsonify({"success": False, "error": "The upload size is required"}), 400
+    upload_id = upload_store.create(str(data.get("filename", "")), size)
+    return jsonify({"success": True, "upload_id": upload_id, "offset": 0})
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    meta = upload_store.status(upload_id)
+    if meta is None:
+        return jsonify({"success": False, "error": "Unknown upload"}), 404
+    return jsonify({"success": True, "offset": meta["offset"], "size": meta["size"], "complete": meta["sha256"] is not None})
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    # Raw bytes starting at ?offset=N; the answer says where the next chunk starts
+    offset = request.args.get('offset', 0, type=int)
+    try:
+        meta = upload_store.append(upload_id, offset, request.stream)
+    except KeyError:
+        return jsonify({"success": False, "error": "Unknown upload"}), 404
+    except UploadOffsetError as e:
+        return jsonify({"success": False, "error": str(e), "offset": e.offset}), 409
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "offset": meta["offset"], "complete": meta["sha256"] is not None})
+
+@app.route('/uploads/known/<content_hash>')
+def upload_known(content_hash):
+    # Lets clients skip the transfer when the transcript of this exact file (sha256) is already cached
+    key = transcript_cache.key(content_hash.lower(), MODEL_ID, TRANSCRIPT_OPTIONS)
+    return jsonify({"known": transcript_cache.contains(key)})
+
+@app.route('/progress/<job_id>')
+def progress(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    return jsonify(job_status(job_id, job))
+
+@app.route('/progress/stream/<job_id>')
+def progress_stream(job_id):
+    if get_job(job_id) is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    if not progress_streams.acquire(blocking=False):
+        return busy_response(PROGRESS_STREAM_INTERVAL)
+    
+    def events():
+        last_status = None
+        sent_segments = 0
+        tier = None
+        resets = None
+        while True:
+            job = get_job(job_id)
+            if job is None:
+                break
+            if resets is not None and job.get("transcript_resets", 0) != resets:
+                # The transcription started over (e.g. a live upload fell back to the complete file): the
+                # page drops what it has and gets the new segments from the start
+                yield "event: reset\ndata: {}\n\n"
+                sent_segments = 0
+            resets = job.get("transcript_resets", 0)
+            if tier == "draft" and job.get("tier") == "final":
+                # The refined transcript replaced the draft's segments; the page reloads it from /results
+                sent_segments = job["segment_count"]
+            tier = job.get("tier")
+            sent = False
+            segments = get_segments(job_id, sent_segments) if job["segment_count"] > sent_segments else None
+            if segments:
+                yield f"event: segments\ndata: {json.dumps(segments)}\n\n"
+                sent_segments += len(segments)
+                sent = True
+            status = job_status(job_id, job)
+            if status != last_status:
+                yield f"data: {json.dumps(status)}\n\n"
+                last_status = status
+                sent = True
+            if not sent:
+                yield ": keep-alive\n\n"
+            if job["status"] in ("complete", "error"):
+                break
+            # Queue position and ETA change without a job update, so wake up now and then regardless
+            wait_for_job_change(job_id, job["version"], PROGRESS_STREAM_INTERVAL)
+    
+    response = Response(stream_with_context(events()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(progress_streams.release)  # also when the page goes away mid-stream
+    return response
+
+def job_status(job_id, job):
+    status = {"status": job["status"], "progress": job["progress"], "message": job["message"]}
+    if job.get("skipped_seconds"):
+        status["skipped_seconds"] = job["skipped_seconds"]
+    if job.get("tier"):
+        status["tier"] = job["tier"]  # draft or final: which transcript /results returns
+    if job.get("summary_tier"):
+        status["summary_tier"] = job["summary_tier"]
+    if job["status"] in ("complete", "error"):
+        return status
+    eta = job.get("eta_seconds") if job["status"] == "processing" else None
+    if eta is None:
+        eta = job_eta(job_id)
+    if eta is not None:
+        status["eta_seconds"] = int(eta)
+    if job["status"] == "queued":
+        position = queue_position(job_id)
+        status["queue_position"] = position
+        status["message"] = f"Waiting in queue (position {position}, about {format_duration(eta or 0)})..."
+    return status
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes} min {seconds} s" if minutes else f"{seconds} s"
+
+@app.route('/health')
+def health():
+    # Liveness only: answers as soon as the app is imported, without touching Whisper
+    return jsonify({"status": "ok"})
+
+@app.route('/ready')
+def ready():
+    # Readiness: with WHISPER_PRELOAD, only once the model is loaded and has run an inference in this
+    # worker. Without it the model is loaded by the first job anyway, so there is nothing to wait for.
+    is_ready = model_warm.is_set() or not WHISPER_PRELOAD
+    status = {"ready": is_ready, "warm": model_warm.is_set(), "preload": WHISPER_PRELOAD, "boot": boot_timings,
+              "profile": WHISPER_PROFILE, "model": MODEL_ID, "decode_options": DECODE_OPTIONS}
+    return jsonify(status), 200 if is_ready else 503
+
+@app.route('/stats')
+def stats():
+    return jsonify({
+        "transcript_cache": transcript_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "speculative_summaries": summary_speculator.stats(),
+        "gemini": gemini_metrics.stats(),
+        "pipeline": scheduler.stats(),
+        "job_store": {"backend": "sqlite", "queued": job_store.queued_count(), "process_jobs": PROCESS_JOBS}
+                     if job_store.shared else {"backend": "memory"},
+        "memory": memory_usage(),
+    })
 
 @app.route('/regenerate_summary', methods=['POST'])
 def regenerate_summary():
     try:
         data = request.json
+        job_id = data.get('job_id')
         api_key = data.get('api_key')
         summary_length = data.get('summary_length')
         summary_format = data.get('summary_format')
+        # The page sends the transcript only when the user has edited it; otherwise it is the job's
         transcript = data.get('transcript')
+        segments = None
+        if transcript is None and job_id:
+            job = get_job(job_id)
+            if job is None:
+                return jsonify({"success": False, "error": "The job has expired, please send the transcript",
+                                "transcript_required": True})
+            transcript, segments = job["transcript"], get_segments(job_id)
         
         if not api_key or not transcript:
             return jsonify({"success": False, "error": "Missing API key or transcript"})
         
-        client = genai.Client(api_key=api_key)
-        
-        prompt = f"""I need to make you the summary of the meeting. It should look like the example.
-
-Format (format 1 or format 2 or format 3): {summary_format}
-Length of the summary (very short, short, medium, long): {summary_length}
-
-Format guidelines:
-- Format 1 (Executive Summary): Organized with bullet points. All bullet points at the equal level. Always starts with 'Talking points:'. Each bullet points starts with character •
-- Format 2 (Structured Meeting Notes): Organized with bullet points. one bullet point can have one or few subbullet points. Always starts with 'Talking points:'. Each bullet points starts with character •
-- Format 3 (Executive Summary): A concise narrative format, divided by paragraphs. Do NOT use any bullet points or asterisk (*)!
-Length guidelines:
-- Very short: Maximum 3-5 main talking points, each with only 1-2 bullet points. Focus on the most critical decisions and next steps only.
-- Short: 5-8 main talking points with 2-3 bullet points each. Include key decisions, main discussions, and important next steps.
-- Medium: 8-12 main talking points with 3-4 bullet points each. Include detailed discussions, background context, and comprehensive next steps.
-- Long: 12+ main talking points with 4+ bullet points each. Include all discussions, full context, detailed explanations, and comprehensive action items.
-
-Please format it as an example and in your answer and just write summary, nothing like 'here you go:
-
-EXAMPLE Format 1:
-Talking points:
-• Two parallel initiatives are underway: enhancing internal documentation practices and refining cross-team collaboration workflows.
-• The documentation initiative introduces a new Notion-based template system, designed to improve onboarding and reduce duplicate knowledge. Early feedback highlights better clarity and discoverability.
-• The collaboration workflow initiative encourages proactive alignment during planning phases. The pilot use case is the re-architecture of the Notification Queue, coordinated by Priya.
-• The Web team is evaluating whether to refactor the current alert system now or wait until the Q4 performance sprint to consolidate efforts.
-• The Slackbot automation pilot has concluded after three iterations. Insights were captured in Confluence, and the team agreed to sunset the bot. The underlying scripts will be deprecated to reduce maintenance overhead.
-
-EXAMPLE Format 2:
-Talking points:
-• Workout recommendation engine update entering limited release January 10–11:
-  • Early tests show strong accuracy improvements over legacy logic
-  • Deployment pipeline has a critical timeout issue that must be resolved before rollout
-  • Maya will collaborate with Leo to debug deployment blocker offline
-• New “Today’s Focus” module under development for user homepage prototype:
-  • Objective is to validate behavior triggers ahead of the Q2 personalized coaching launch
-  • Initial version will act as a dynamic widget with A/B support for motivational prompts
-  • Jenna will finalize feature specs after her strategy sync in San Francisco this week
-• Team member updates:
-  • Leo: Wrapped backend latency audit, now focused on error tracing for batch endpoints
-  • Sarah: Completing frontend edge-case QA for hydration tracker
-  • James: Finalizing Android biometric auth issues, then resuming image compression tasks
-  • Ren: Investigating user session drop-offs and preparing patch for event queue instability
-  • Tanya: Implementing new calendar sync logic and cross-platform UI consistency checks
-  • Marcus: Workout summary redesign in final stages, polishing animation timing and layout spacing
-
-EXAMPLE Format 3:
-The meeting centered around recent product performance metrics and strategic shifts in the roadmap. A decline in user engagement on the mobile app prompted the leadership team to pause development on two lesser-used features and reallocate resources.
-
-To maintain velocity on core initiatives, current engineering staffing levels will be preserved. The team discussed shifting ownership of parts of the Analytics pipeline and Notification System to ensure better alignment with growth goals.
-
-The Helix and Orbit integrations will be sunsetted next quarter, which will reduce complexity but temporarily limit some partner functionality. Over the next month, the team will join cross-functional sessions to help shape the updated product vision and long-term KPIs.
-
-Leadership acknowledged ongoing tensions around roadmap clarity, reiterating that near-term focus will be on initiatives tied directly to user retention and daily active usage growth.
-
-Here is the transcript to summarize:
-{transcript}"""
+        summary = generate_summary(api_key, transcript, summary_length, summary_format, segments)
         
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
+        # Keep the job's results in sync with what the user is looking at
+        if job_id:
+            update_job(job_id, summary=summary)
         
-        return jsonify({"success": True, "summary": response.text})
+        return jsonify({"success": True, "summary": summary})
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/results')
-def results():
-    return jsonify({"transcript": current_transcript, "summary": current_summary})
+@app.route('/results/<job_id>')
+def results(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    # The job's version changes with every update, so it makes a cheap ETag; an unchanged job costs
+    # the client a 304 instead of the whole transcript again. ?fields=summary leaves the transcript out,
+    # for a page that already has it from the progress stream.
+    summary_only = request.args.get("fields") == "summary"
+    etag = f"{job_id}-{job['version']}" + ("-summary" if summary_only else "")
+    for variant in (etag, f"{etag}-gzip"):
+        if variant in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(variant)
+            return response
+    payload = {} if summary_only else {"transcript": job["transcript"]}
+    payload.update(summary=job["summary"], tier=job.get("tier"), summary_tier=job.get("summary_tier"))
+    return compressed_json(payload, etag)
 
-def process_video_thread(video_path, api_key, summary_length, summary_format):
-    global processing_status, current_transcript, current_summary, whisper_model
+def compressed_json(payload, etag):
+    # gzip for clients that accept it, once the body is big enough for it to pay off. The compressed
+    # variant gets an ETag of its own, as a cache may keep both.
+    body = json.dumps(payload).encode()
+    response = Response(body, mimetype="application/json")
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+        etag += "-gzip"
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # may be stored, but must be revalidated
+    return response
+
+@app.route('/segments/<job_id>')
+def segments(job_id):
+    # Transcript segments decoded so far; pass ?since=<next> from the previous response to get only new ones
+    since = request.args.get('since', 0, type=int)
+    job = get_job(job_id)
+    new_segments = get_segments(job_id, since)
+    if job is None or new_segments is None:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    # When tier changes from draft to final, the segments were replaced: start again from since=0
+    return jsonify({"segments": new_segments, "next": since + len(new_segments), "status": job["status"],
+                    "tier": job.get("tier")})
+
+def split_transcript(transcript, max_tokens, segments=None):
+    # Splits on segment boundaries when Whisper segments are available, otherwise on sentence ends.
+    # A single piece over the budget is cut by length as a last resort.
+    if segments:
+        pieces = [segment["text"] for segment in segments]
+    else:
+        pieces = re.split(r"(?<=[.!?])\s+", transcript)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = ""
+    for piece in pieces:
+        while len(piece) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(piece[:max_chars])
+            piece = piece[max_chars:]
+        separator = "" if segments or not current else " "
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current += separator + piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def summarize_in_chunks(client, transcript, summary_length, summary_format, segments=None):
+    # Map: notes for each chunk, at most SUMMARY_MAX_IN_FLIGHT requests at a time.
+    # Reduce: the regular summary prompt over the notes. Notes that are still too long are mapped again.
+    text = transcript
+    previous_count = None
+    while True:
+        chunks = split_transcript(text, SUMMARY_CHUNK_TOKENS, segments)
+        print(f"Summarizing {len(chunks)} transcript chunks...")
+        with ThreadPoolExecutor(max_workers=SUMMARY_MAX_IN_FLIGHT) as executor:
+            notes = list(executor.map(
+                lambda numbered: complete_prompt(client, build_partial_summary_prompt(numbered[1], numbered[0], len(chunks))),
+                enumerate(chunks, 1),
+            ))
+        text = "\n\n".join(f"Part {part}:\n{note}" for part, note in enumerate(notes, 1))
+        segments = None
+        # Stop once the notes fit, or when another round would not make them any shorter
+        if (summary_prompt_tokens(text, summary_length, summary_format, NOTES_SOURCE) <= MAP_REDUCE_THRESHOLD_TOKENS
+                or len(chunks) == 1 or len(chunks) == previous_count):
+            break
+        previous_count = len(chunks)
+    
+    return complete_prompt(client, build_summary_prompt(text, summary_length, summary_format, NOTES_SOURCE))
+
+def complete_prompt(client, prompt):
+    response = client.models.generate_content(
+        model=SUMMARY_MODEL,
+        contents=prompt
+    )
+    return response.text
+
+# Summaries being generated, by API key and cache key: a request for one of them waits for it instead of
+# asking Gemini again, e.g. a click on a variant that is being precomputed. Only requests with the same key
+# share a call, so one user's failing or rate-limited key never answers another user's request.
+summary_requests = {}
+summary_requests_lock = threading.Lock()
+
+def generate_summary(api_key, transcript, summary_length, summary_format, segments=None, count=True):
+    # The prompt depends only on these inputs, so an identical request can be answered from the cache.
+    # count=False keeps background work out of the cache's hit and miss counts.
+    cache_key = summary_cache.key(transcript, summary_length, summary_format, SUMMARY_MODEL)
+    summary = summary_cache.get(cache_key, count=count)
+    if summary is not None:
+        print("Summary cache hit")
+        return summary
+    
+    request_key = (api_key, cache_key)
+    with summary_requests_lock:
+        pending = summary_requests.get(request_key)
+        if pending is None:
+            request_future = summary_requests[request_key] = Future()
+    if pending is not None:
+        print("Waiting for the same summary being generated")
+        return pending.result()
     
     try:
-        print(f"Starting video processing for: {video_path}")
-        
-        # Check if FFmpeg is available
-        try:
-            ffmpeg_check = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, timeout=10)
-            if ffmpeg_check.returncode != 0:
-                raise Exception("FFmpeg not found")
-            print("FFmpeg is available")
-        except Exception as e:
-            print(f"FFmpeg check failed: {e}")
-            processing_status = {"status": "error", "progress": 0, "message": f"FFmpeg not available: {str(e)}"}
+        client = gemini_pool.get(api_key)
+        longer = longer_summary(transcript, summary_length, summary_format) if SUMMARY_CONDENSE else None
+        if longer is not None:
+            print(f"Condensing a longer summary into a {summary_length} one")
+            summary = complete_prompt(client, build_condense_prompt(longer, summary_length, summary_format))
+        elif needs_chunking(transcript, summary_length, summary_format):
+            summary = summarize_in_chunks(client, transcript, summary_length, summary_format, segments)
+        else:
+            summary = complete_prompt(client, build_summary_prompt(transcript, summary_length, summary_format))
+        if summary:
+            summary_cache.set(cache_key, summary)
+        request_future.set_result(summary)
+        return summary
+    except Exception as e:
+        request_future.set_exception(e)
+        raise
+    finally:
+        with summary_requests_lock:
+            summary_requests.pop(request_key, None)
+
+def needs_chunking(transcript, summary_length, summary_format):
+    # Decided from the estimated size of the whole prompt before anything is sent, so an oversize
+    # transcript goes the map-reduce way right away instead of failing after a long wait
+    return summary_prompt_tokens(transcript, summary_length, summary_format) > MAP_REDUCE_THRESHOLD_TOKENS
+
+def longer_summary(transcript, summary_length, summary_format):
+    # The closest longer cached summary of the transcript, preferably in the same format. Condensing
+    # it is one short request instead of reading the whole transcript (or all of its chunks) again.
+    if summary_length not in SUMMARY_LENGTHS:
+        return None
+    formats = [summary_format] + [other for other in SUMMARY_FORMATS if other != summary_format]
+    for length in SUMMARY_LENGTHS[SUMMARY_LENGTHS.index(summary_length) + 1:]:
+        for candidate_format in formats:
+            summary = summary_cache.get(summary_cache.key(transcript, length, candidate_format, SUMMARY_MODEL), count=False)
+            if summary is not None:
+                return summary
+    return None
+
+def summary_request_count(transcript, summary_length, summary_format):
+    # Gemini requests that generate_summary would send for this variant
+    if SUMMARY_CONDENSE and longer_summary(transcript, summary_length, summary_format) is not None:
+        return 1
+    if not needs_chunking(transcript, summary_length, summary_format):
+        return 1
+    return -(-estimate_tokens(transcript) // SUMMARY_CHUNK_TOKENS) + 1
+
+def likely_summary_variants(summary_length, summary_format):
+    # The other lengths and formats, most likely next pick first: neighbouring lengths in the same
+    # format, then the same length in the other formats, and so on. Shorter first on a tie.
+    index = SUMMARY_LENGTHS.index(summary_length)
+    variants = [(length, other) for length in SUMMARY_LENGTHS for other in SUMMARY_FORMATS
+                if (length, other) != (summary_length, summary_format)]
+    return sorted(variants, key=lambda variant: (abs(SUMMARY_LENGTHS.index(variant[0]) - index)
+                                                 + 1.5 * (variant[1] != summary_format),
+                                                 SUMMARY_LENGTHS.index(variant[0])))
+
+class SummarySpeculator:
+    # Precomputes summary variants of finished jobs on a single background thread, and only while the API
+    # key and the GEMINI_MAX_IN_FLIGHT slots have capacity to spare, so it doesn't compete with the summaries
+    # jobs are waiting for. At most SPECULATIVE_MAX_QUEUED jobs wait their turn; the oldest are dropped.
+    def __init__(self, budget):
+        self.budget = budget
+        self.pending = collections.deque(maxlen=SPECULATIVE_MAX_QUEUED)
+        self.cond = threading.Condition()
+        self.thread = None
+        self.generated = 0
+        self.requests = 0
+        self.dropped = 0
+
+    def submit(self, api_key, transcript, segments, summary_length, summary_format):
+        if self.budget <= 0 or summary_length not in SUMMARY_LENGTHS or summary_format not in SUMMARY_FORMATS:
             return
-        
-        # Step 1: Convert to audio
-        print("Converting video to audio...")
-        processing_status = {"status": "processing", "progress": 30, "message": "Converting video to audio..."}
-        audio_path = os.path.join(tempfile.gettempdir(), "temp_audio.mp3")
-        
-        cmd = ["ffmpeg", "-y", "-i", video_path, "-vn", "-acodec", "mp3", "-ar", "16000", audio_path]
+        with self.cond:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append((api_key, transcript, segments, summary_length, summary_format))
+            if self.thread is None:
+                # Started lazily so importing the app (e.g. in the gunicorn master) starts no threads
+                self.thread = threading.Thread(target=self._worker, daemon=True, name="speculative-summary")
+                self.thread.start()
+            self.cond.notify()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                args = self.pending.popleft()
+            try:
+                self.run(*args)
+            except Exception as e:
+                print(f"Speculative summaries failed: {e}")
+
+    def run(self, api_key, transcript, segments, summary_length, summary_format):
+        budget = self.budget
+        for length, variant_format in likely_summary_variants(summary_length, summary_format):
+            if summary_cache.get(summary_cache.key(transcript, length, variant_format, SUMMARY_MODEL), count=False) is not None:
+                continue
+            cost = summary_request_count(transcript, length, variant_format)
+            if cost > budget:
+                continue  # a cheaper variant may still fit
+            if not gemini_pool.get(api_key).has_spare_capacity(cost):
+                print("Gemini is busy, skipping the remaining speculative summaries")
+                with self.cond:
+                    self.dropped += 1
+                return
+            try:
+                generate_summary(api_key, transcript, length, variant_format, segments, count=False)
+            except Exception as e:
+                print(f"Speculative summary failed, stopping: {e}")
+                return
+            budget -= cost
+            with self.cond:
+                self.generated += 1
+                self.requests += cost
+            print(f"Precomputed the {length} {variant_format} summary ({budget} requests left)")
+
+    def stats(self):
+        with self.cond:
+            return {"budget": self.budget, "condense": SUMMARY_CONDENSE, "generated": self.generated,
+                    "requests": self.requests, "queued": len(self.pending), "dropped": self.dropped}
+
+summary_speculator = SummarySpeculator(SPECULATIVE_SUMMARY_BUDGET)
+
+class TranscribeProgressBar:
+    # Stands in for tqdm inside whisper.transcribe. Whisper advances it by mel frames (100 per second of
+    # audio) after every decoded window; the count is forwarded to the calling thread's job.
+    def __init__(self, total=None, **kwargs):
+        self.total = total
+        self.n = 0
+        self.callback = getattr(transcribe_progress, "callback", None)
+
+    def update(self, n=1):
+        self.n += n
+        if self.callback is not None and self.total:
+            self.callback(self.n / self.total)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+def install_progress_hook():
+    # whisper.transcribe is shadowed by the function of the same name, so look the module up directly
+    try:
+        module = importlib.import_module("whisper.transcribe")
+        module.tqdm = types.SimpleNamespace(tqdm=TranscribeProgressBar)
+    except Exception as e:
+        print(f"Could not install Whisper progress hook: {e}")
+
+def import_whisper():
+    # whisper pulls in torch, which takes seconds to import. Defer it until a model is actually needed
+    # so worker boot and health checks don't pay for it.
+    if "whisper" not in sys.modules:
+        started = time.time()
+        importlib.import_module("whisper")
+        install_progress_hook()
+        boot_timings["whisper_import_seconds"] = round(time.time() - started, 2)
+        print(f"Imported whisper in {boot_timings['whisper_import_seconds']} s")
+    return sys.modules["whisper"]
+
+def configure_torch_threads(threads):
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(WHISPER_INTEROP_THREADS)
+    except RuntimeError:
+        pass  # can only be set once per process, before any inter-op work has started
+
+def load_whisper_model(model_name, quantize=False):
+    model = import_whisper().load_model(model_name)
+    if quantize:
+        import torch
+        if model.device.type != "cpu":
+            print("int8 quantization only applies to CPU inference, keeping the model as is")
+            return model
+        # Whisper's Linear subclass only casts its weights to the input dtype, which is a no-op in fp32 on
+        # CPU. Turn them into plain nn.Linear so quantize_dynamic recognises and replaces them.
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+def threads_per_job():
+    # Each concurrent job gets its share of the cores instead of every job using all of them
+    return WHISPER_THREADS or max(1, (os.cpu_count() or 1) // MAX_CONCURRENT_JOBS)
+
+def get_whisper_model():
+    global whisper_model
+    with whisper_model_lock:
+        if whisper_model is None:
+            print(f"Loading Whisper {MODEL_ID} model ({WHISPER_PROFILE} profile)...")
+            started = time.time()
+            model = load_whisper_model(WHISPER_MODEL, WHISPER_QUANTIZE)
+            configure_torch_threads(threads_per_job())
+            whisper_model = model  # only once set up, so a failed setup is retried by the next caller
+            boot_timings["model_load_seconds"] = round(time.time() - started, 2)
+            print(f"Whisper model loaded in {boot_timings['model_load_seconds']} s")
+        return whisper_model
+
+def get_draft_model():
+    global draft_model
+    with whisper_model_lock:
+        if draft_model is None:
+            print(f"Loading Whisper {DRAFT_MODEL} draft model...")
+            started = time.time()
+            model = load_whisper_model(DRAFT_MODEL)
+            configure_torch_threads(threads_per_job())
+            draft_model = model
+            print(f"Draft model loaded in {time.time() - started:.2f} s")
+        return draft_model
+
+def warm_up():
+    # Model load plus one dummy inference, so the first real job pays for neither
+    started = time.time()
+    try:
+        model = get_whisper_model()
+        model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), verbose=False, **DECODE_OPTIONS)
+        if DRAFT_MODEL:
+            get_draft_model().transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), verbose=False, **DRAFT_DECODE_OPTIONS)
+        if TRANSCRIBE_WORKERS > 1:
+            pool = get_transcribe_pool()
+            dummy_chunks = [pool.submit(transcribe_chunk, np.zeros(SAMPLE_RATE, dtype=np.float32), 0.0, DECODE_OPTIONS)
+                            for _ in range(TRANSCRIBE_WORKERS)]
+            for future in dummy_chunks:
+                future.result()
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        return
+    model_warm.set()
+    boot_timings["warm_up_seconds"] = round(time.time() - started, 2)
+    boot_timings["ready_after_seconds"] = round(time.time() - BOOT_STARTED, 2)
+    print(f"Warm-up complete in {boot_timings['warm_up_seconds']} s, memory: {memory_usage()}")
+
+def memory_usage():
+    # Pss splits shared pages between the processes mapping them, so the sum of Pss over all workers is
+    # the real footprint; Shared_* shows how much of the model is actually shared after the fork.
+    usage = {"pid": os.getpid(), "shared_model": WHISPER_SHARED_MODEL}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    usage[name.lower() + "_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        # No /proc (e.g. macOS, where ru_maxrss is in bytes rather than KB)
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["max_rss_mb"] = round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return usage
+
+def start_warm_up():
+    # Call after fork (gunicorn post_fork, see gunicorn.conf.py): threads don't survive a fork
+    threading.Thread(target=warm_up, daemon=True).start()
+
+def transcription_reporter(job_id, duration, label="Transcribing audio", low=40, high=80):
+    # Returns a callback taking the transcribed fraction; maps it onto the low-high band of the progress bar
+    started = time.time()
+    
+    def report(fraction):
+        fraction = min(1.0, max(0.0, fraction))
+        elapsed = time.time() - started
+        eta = elapsed / fraction * (1 - fraction) if fraction > 0 else None
+        message = f"{label}... {format_duration(fraction * duration)} of {format_duration(duration)}"
+        if eta is not None:
+            message += f", about {format_duration(eta)} left"
+        update_job(job_id, progress=low + int((high - low) * fraction), message=message, eta_seconds=eta)
+    
+    return report
+
+class UnsupportedMediaError(Exception):
+    pass
+
+def probe_media(video_path):
+    # Streams and duration from ffprobe, or None when ffprobe isn't installed (then ffmpeg finds out).
+    # Raises UnsupportedMediaError for files ffprobe can't read and for files without an audio track.
+    cmd = ["ffprobe", "-v", "error", "-of", "json", "-show_entries",
+           "format=duration,bit_rate:stream=index,codec_type,codec_name,sample_rate,channels:stream_disposition=default",
+           video_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"ffprobe unavailable: {e}")
+        return None
+    if result.returncode != 0:
+        print(f"ffprobe stderr: {result.stderr}")
+        raise UnsupportedMediaError("The file could not be read as audio or video")
+    info = json.loads(result.stdout or "{}")
+    audio_streams = [stream for stream in info.get("streams", []) if stream.get("codec_type") == "audio"]
+    if not audio_streams:
+        raise UnsupportedMediaError("The file has no audio track")
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    try:
+        bit_rate = int(info.get("format", {}).get("bit_rate"))
+    except (TypeError, ValueError):
+        bit_rate = None
+    # The track marked as default is the one players pick (e.g. the main language, not commentary)
+    default = [stream for stream in audio_streams if stream.get("disposition", {}).get("default")]
+    return {"duration": duration, "bit_rate": bit_rate, "audio_stream": (default or audio_streams)[0]}
+
+def ffmpeg_decode_command(video_path, media=None):
+    # 16 kHz mono 16-bit PCM on ffmpeg's stdout. With probe results only the chosen audio track is mapped,
+    # so video packets are dropped right after demuxing instead of being decoded. Audio that already is
+    # 16 kHz mono PCM is copied as is; ffmpeg skips the resampler by itself when only the channel count differs.
+    cmd = ["ffmpeg", "-nostdin", "-i", video_path]
+    stream = media["audio_stream"] if media else None
+    if stream is None:
+        cmd += ["-vn"]
+    else:
+        cmd += ["-map", f"0:{stream['index']}"]
+    if stream is not None and stream.get("codec_name") == "pcm_s16le" and stream.get("channels") == 1 \
+            and int(stream.get("sample_rate") or 0) == SAMPLE_RATE:
+        cmd += ["-acodec", "copy"]
+    else:
+        cmd += ["-ac", "1", "-ar", str(SAMPLE_RATE), "-acodec", "pcm_s16le"]
+    return cmd + ["-f", "s16le", "-"]
+
+def load_audio(video_path, media=None):
+    # Decode once, straight to 16 kHz mono PCM on ffmpeg's stdout, and hand the samples to Whisper as a
+    # float32 array. No intermediate audio file, so nothing to clean up and nothing shared between jobs.
+    cmd = ffmpeg_decode_command(video_path, media)
+    print(f"Running FFmpeg command: {' '.join(cmd)}")
+    
+    result = subprocess.run(cmd, capture_output=True, timeout=300)  # 5 minute timeout
+    
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors="replace")
+        print(f"FFmpeg stderr: {stderr}")
+        raise Exception(f"FFmpeg error: {stderr}")
+    
+    audio = np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+    if audio.size == 0:
+        raise Exception("No audio could be extracted from the video")
+    return audio
+
+class AudioStream:
+    # Decodes with ffmpeg into a pipe and hands out fixed-size windows of samples, so only one window is
+    # held at a time. ffmpeg's log is read on a side thread (a full stderr pipe would stall the decoder);
+    # the input's duration is picked up from it for progress reporting. With `feed` (an iterable of byte
+    # chunks, e.g. an upload that is still arriving) the input is written to ffmpeg's stdin instead.
+    def __init__(self, video_path, media=None, feed=None):
+        cmd = ffmpeg_decode_command("pipe:0" if feed is not None else video_path, media)
         print(f"Running FFmpeg command: {' '.join(cmd)}")
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE if feed is not None else None,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.duration = media["duration"] if media else None
+        self.log_tail = collections.deque(maxlen=50)
+        self.log_thread = threading.Thread(target=self._read_log, daemon=True)
+        self.log_thread.start()
+        self.feed_error = None
+        if feed is not None:
+            threading.Thread(target=self._feed, args=(feed,), daemon=True).start()
+    
+    def _feed(self, feed):
+        try:
+            for chunk in feed:
+                self.process.stdin.write(chunk)
+        except (BrokenPipeError, ValueError):
+            pass  # ffmpeg stopped reading; its exit status says why
+        except Exception as e:
+            self.feed_error = e
+        finally:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+    
+    def _read_log(self):
+        for line in iter(self.process.stderr.readline, b""):
+            text = line.decode(errors="replace").rstrip()
+            self.log_tail.append(text)
+            match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", text)
+            if match and self.duration is None:
+                hours, minutes, seconds = match.groups()
+                self.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    def windows(self, samples):
+        # Yields float32 arrays of `samples` samples (the last one shorter)
+        try:
+            while True:
+                data = self.process.stdout.read(samples * 2)
+                if not data:
+                    break
+                yield np.frombuffer(data[:len(data) // 2 * 2], np.int16).astype(np.float32) / 32768.0
+        except BaseException:
+            self.process.kill()
+            raise
+        finally:
+            self.process.stdout.close()
+            self.process.wait()
+            self.log_thread.join(timeout=5)
+        if self.feed_error is not None:
+            raise self.feed_error
+        if self.process.returncode != 0:
+            stderr = "\n".join(self.log_tail)
+            print(f"FFmpeg stderr: {stderr}")
+            raise Exception(f"FFmpeg error: {stderr}")
+
+def quietest_point(audio, target, search):
+    # Sample index of the lowest-energy 100 ms frame within +-search samples of target
+    frame = SAMPLE_RATE // 10
+    start = max(0, target - search)
+    window = audio[start:min(len(audio), target + search)]
+    frame_count = len(window) // frame
+    if frame_count == 0:
+        return target
+    energy = np.square(window[:frame_count * frame].reshape(frame_count, frame)).mean(axis=1)
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+def split_audio(audio, chunk_seconds):
+    # Returns (start, end) sample ranges of roughly chunk_seconds each, cut at the quietest nearby moment
+    # so words are not split in half. A short tail is merged into the last chunk.
+    chunk = int(chunk_seconds * SAMPLE_RATE)
+    search = min(chunk // 10, 5 * SAMPLE_RATE)
+    boundaries = [0]
+    while len(audio) - boundaries[-1] > chunk + chunk // 4:
+        boundaries.append(quietest_point(audio, boundaries[-1] + chunk, search))
+    boundaries.append(len(audio))
+    return list(zip(boundaries, boundaries[1:]))
+
+def find_speech_regions(audio):
+    # Energy-based: 30 ms frames more than VAD_THRESHOLD_DB above the noise floor (5th percentile of all
+    # frames) count as sound. The threshold also stays VAD_THRESHOLD_DB below the loud frames (95th
+    # percentile), so a recording without quiet parts (steady noise, music) is kept whole. Only quiet runs
+    # of at least VAD_MIN_SILENCE_SECONDS are removed, so pauses between words and sentences stay.
+    # Returns the (start, end) sample ranges to keep.
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+    frame_count = len(audio) // frame
+    if frame_count == 0:
+        return [(0, len(audio))]
+    frames = audio[:frame_count * frame].reshape(frame_count, frame)
+    level = 10 * np.log10(np.einsum("ij,ij->i", frames, frames) / frame + 1e-10)
+    floor, loud = np.percentile(level, [5, 95])
+    if loud < VAD_SILENCE_LEVEL_DB:
+        return []  # silent recording
+    threshold = min(max(floor + VAD_THRESHOLD_DB, VAD_SILENCE_LEVEL_DB), loud - VAD_THRESHOLD_DB)
+    
+    quiet = np.concatenate(([False], level < threshold, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    padding = int(VAD_PADDING_SECONDS / VAD_FRAME_SECONDS)
+    # A run must outlast the padding on both sides, or the cut would end before it starts
+    min_frames = max(int(VAD_MIN_SILENCE_SECONDS / VAD_FRAME_SECONDS), 2 * padding + 1)
+    
+    regions = []
+    position = 0
+    for quiet_start, quiet_end in zip(edges[0::2], edges[1::2]):
+        if quiet_end - quiet_start < min_frames:
+            continue
+        cut_start = 0 if quiet_start == 0 else int(quiet_start + padding) * frame
+        cut_end = len(audio) if quiet_end == frame_count else int(quiet_end - padding) * frame
+        if cut_start > position:
+            regions.append((position, cut_start))
+        position = cut_end
+    if position < len(audio):
+        regions.append((position, len(audio)))
+    return regions
+
+class SpeechTimeline:
+    # Maps timestamps in the silence-stripped audio back to the original recording
+    def __init__(self, regions):
+        self.regions = regions
+        self.compact_starts = []
+        total = 0
+        for start, end in regions:
+            self.compact_starts.append(total)
+            total += end - start
+
+    def to_original(self, seconds, is_end=False):
+        # An end time exactly on a cut belongs to the region before it, a start time to the one after it
+        position = seconds * SAMPLE_RATE
+        search = bisect.bisect_left if is_end else bisect.bisect_right
+        index = max(0, search(self.compact_starts, position) - 1)
+        return (self.regions[index][0] + position - self.compact_starts[index]) / SAMPLE_RATE
+
+    def restore(self, segments):
+        return [dict(segment, start=self.to_original(segment["start"]), end=self.to_original(segment["end"], True))
+                for segment in segments]
+
+def init_transcribe_worker(model_name, quantize, threads):
+    global whisper_model
+    whisper_model = load_whisper_model(model_name, quantize)
+    configure_torch_threads(threads)
+    print(f"Transcription worker {os.getpid()} loaded Whisper {model_name} model")
+
+def transcribe_chunk(audio, offset, options):
+    # Runs in a pool worker; timestamps are shifted back to the position of the chunk in the full audio
+    result = whisper_model.transcribe(audio, **options)
+    return [{"start": segment["start"] + offset, "end": segment["end"] + offset, "text": segment["text"]}
+            for segment in result["segments"]]
+
+def get_transcribe_pool():
+    global transcribe_pool
+    with transcribe_pool_lock:
+        if transcribe_pool is None:
+            # spawn, not fork: torch's thread pools don't survive a fork
+            threads = max(1, (os.cpu_count() or 1) // TRANSCRIBE_WORKERS)
+            transcribe_pool = ProcessPoolExecutor(
+                max_workers=TRANSCRIBE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_transcribe_worker,
+                initargs=(WHISPER_MODEL, WHISPER_QUANTIZE, threads),
+            )
+        return transcribe_pool
+
+def transcribe_parallel(audio, on_progress=None, on_segments=None, checkpoint=None):
+    chunks = split_audio(audio, CHUNK_SECONDS)
+    overlap = int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+    segments = []
+    done = 0
+    if checkpoint is not None and checkpoint.position:
+        # The stitched prefix of a previous attempt
+        chunks = [chunk for chunk in chunks if chunk[1] > checkpoint.position]
+        segments = list(checkpoint.segments)
+        done = checkpoint.position
+        if on_segments is not None:
+            on_segments(segments)
+    print(f"Transcribing {len(chunks)} chunks on {TRANSCRIBE_WORKERS} workers...")
+    
+    pool = get_transcribe_pool()
+    futures = []
+    for start, end in chunks:
+        padded_start = max(0, start - overlap)
+        padded_end = min(len(audio), end + overlap)
+        futures.append(pool.submit(transcribe_chunk, audio[padded_start:padded_end], padded_start / SAMPLE_RATE,
+                                   DECODE_OPTIONS))
+    
+    # Chunks finish out of order; stitch and publish the finished prefix as soon as it grows
+    index_of = {future: index for index, future in enumerate(futures)}
+    finished = set()
+    stitched = 0
+    for future in as_completed(futures):
+        start, end = chunks[index_of[future]]
+        finished.add(index_of[future])
+        done += end - start
+        if on_progress is not None:
+            on_progress(done / len(audio))
+        while stitched in finished:
+            new_segments = stitch_chunk(chunks[stitched], futures[stitched].result(), len(audio), segments)
+            segments.extend(new_segments)
+            if on_segments is not None:
+                on_segments(new_segments)
+            if checkpoint is not None:
+                checkpoint.save(chunks[stitched][1], new_segments)
+            stitched += 1
+    
+    model_warm.set()  # the pool's models have run, which is what this process's jobs use
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+def stitch_chunk(chunk, chunk_segments, total, previous):
+    # Overlapping regions are transcribed twice. Each segment is kept only in the chunk that owns its
+    # midpoint, and its times are clipped to the chunk and to the end of the segments stitched so far
+    # (previous), so the stitched segments never overlap. A segment starting in the overlap can still
+    # repeat the words the previous chunk ended with; those words are dropped.
+    start, end = chunk[0] / SAMPLE_RATE, chunk[1] / SAMPLE_RATE
+    last = chunk[1] == total
+    previous_end = previous[-1]["end"] if previous else 0.0
+    tail = "".join(segment["text"] for segment in previous[-3:]).split()[-30:]
+    kept = []
+    for segment in chunk_segments:
+        midpoint = (segment["start"] + segment["end"]) / 2
+        if midpoint < start or (midpoint >= end and not last):
+            continue
+        text = segment["text"]
+        if not kept and previous and segment["start"] < start + CHUNK_OVERLAP_SECONDS:
+            text = drop_repeated_words(text, tail)
+            if not text.strip():
+                continue
+        segment_start = max(segment["start"], start, previous_end)
+        segment_end = max(segment_start, segment["end"] if last else min(segment["end"], end))
+        kept.append(dict(segment, start=segment_start, end=segment_end, text=text))
+        previous_end = segment_end
+    return kept
+
+def drop_repeated_words(text, tail):
+    # Removes the longest run of leading words of text that the words in tail end with
+    def normalize(word):
+        return re.sub(r"[^\w']", "", word.lower())
+    words = text.split()
+    leading = [normalize(word) for word in words]
+    ending = [normalize(word) for word in tail]
+    for count in range(min(len(words), len(tail)), 0, -1):
+        if leading[:count] == ending[-count:]:
+            return " " + " ".join(words[count:]) if count < len(words) else ""
+    return text
+
+def decode_window(model, audio, offset, prompt, options):
+    # Transcribes one window; timestamps are shifted by offset seconds
+    result = model.transcribe(audio, verbose=False, initial_prompt=prompt, **options)
+    return [{"start": segment["start"] + offset, "end": segment["end"] + offset, "text": segment["text"]}
+            for segment in result["segments"]]
+
+def context_prompt(segments):
+    return "".join(segment["text"] for segment in segments)[-PROMPT_CONTEXT_CHARS:] or None
+
+class TranscriptionCheckpoint:
+    # The windows of a transcription pass completed so far, saved with the job (in the sqlite job store)
+    # as each one finishes. When a job is taken over from a worker that crashed or was restarted, the
+    # pass skips them and continues after the last one. position is in samples of the audio the pass
+    # works on and the segments are in its time; the settings that decide where windows are cut are
+    # part of the fingerprint, so a pass with other settings starts from zero.
+    def __init__(self, job_id, *settings):
+        self.job_id = job_id
+        self.fingerprint = hashlib.sha256(json.dumps([MODEL_ID, TRANSCRIPT_OPTIONS, settings]).encode()).hexdigest()
+        self.position, self.segments = job_store.load_checkpoint(job_id, self.fingerprint)
+        if self.position:
+            print(f"Resuming transcription of job {job_id} at {self.position / SAMPLE_RATE:.1f} s")
+
+    def save(self, position, segments):
+        job_store.save_checkpoint(self.job_id, self.fingerprint, position, segments)
+
+def transcribe_windows(model, audio, on_progress, on_segments, options=DECODE_OPTIONS, checkpoint=None):
+    # Transcribes window by window (cut at quiet points) and publishes each window's segments as soon
+    # as they are decoded. The tail of the text so far is passed as the prompt of the next window so
+    # context carries across window boundaries.
+    if TRANSCRIBE_WINDOW_SECONDS > 0:
+        windows = split_audio(audio, TRANSCRIBE_WINDOW_SECONDS)
+    else:
+        windows = [(0, len(audio))]
+    segments = []
+    if checkpoint is not None and checkpoint.segments:
+        segments = list(checkpoint.segments)
+        on_segments(segments)
+    try:
+        for start, end in windows:
+            if checkpoint is not None and end <= checkpoint.position:
+                continue
+            transcribe_progress.callback = lambda fraction, start=start, end=end: on_progress(
+                (start + fraction * (end - start)) / len(audio))
+            window_segments = decode_window(model, audio[start:end], start / SAMPLE_RATE, context_prompt(segments), options)
+            segments.extend(window_segments)
+            on_segments(window_segments)
+            if checkpoint is not None:
+                checkpoint.save(end, window_segments)
+    finally:
+        transcribe_progress.callback = None
+    
+    if model is whisper_model:
+        model_warm.set()
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+def transcribe_streaming(job_id, video_path, model, options=DECODE_OPTIONS, label="Transcribing audio",
+                         low=40, high=80, live=True, media=None, feed=None, checkpoint=None):
+    # Same windowed decoding as transcribe_windows, but the audio comes straight from ffmpeg one window
+    # at a time. Each window is cut at a quiet point near its end and the rest is carried over into the
+    # next one, together with the text prompt, so words on a boundary are not split. Silence removal
+    # runs per window. Only the current window and the transcript text are kept in memory.
+    window = int((TRANSCRIBE_WINDOW_SECONDS or 60) * SAMPLE_RATE)
+    search = min(window // 10, 5 * SAMPLE_RATE)
+    stream = AudioStream(video_path, media, feed)
+    update_job(job_id, status="processing", progress=low, message=f"{label}...")
+    print(f"Starting streaming transcription ({label.lower()})...")
+    
+    segments = []
+    state = {"position": 0, "skipped": 0, "report": None}
+    resume = 0
+    if checkpoint is not None and checkpoint.position:
+        # FFmpeg still decodes the part done before; it is dropped rather than transcribed again
+        resume = state["position"] = checkpoint.position
+        segments = list(checkpoint.segments)
+        if live:
+            append_segments(job_id, segments)
+    
+    def transcribe_piece(piece):
+        # piece starts at state["position"] samples into the recording
+        offset = state["position"] / SAMPLE_RATE
+        timeline = None
+        if VAD_ENABLED:
+            regions = find_speech_regions(piece)
+            skipped = len(piece) - sum(end - start for start, end in regions)
+            if skipped > 0:
+                state["skipped"] += skipped
+                update_job(job_id, skipped_seconds=round(state["skipped"] / SAMPLE_RATE, 1))
+                timeline = SpeechTimeline(regions)
+                piece = np.concatenate([piece[start:end] for start, end in regions]) if regions else piece[:0]
+        if len(piece) > 0:
+            if state["report"] is None and stream.duration:
+                state["report"] = transcription_reporter(job_id, stream.duration, label, low, high)
+            report = state["report"]
+            if report is not None:
+                length = len(piece) / SAMPLE_RATE
+                transcribe_progress.callback = lambda fraction: report((offset + fraction * length) / stream.duration)
+            piece_segments = decode_window(model, piece, 0, context_prompt(segments), options)
+            if timeline is not None:
+                piece_segments = timeline.restore(piece_segments)
+            piece_segments = [dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+                              for segment in piece_segments]
+            segments.extend(piece_segments)
+            if live:
+                append_segments(job_id, piece_segments)
+            return piece_segments
+        return []
+    
+    carry = np.zeros(0, np.float32)
+    try:
+        for block in stream.windows(window):
+            # a short block is the end of the stream; nothing to carry over
+            last = len(block) < window
+            if resume:
+                skip = min(resume, len(block))
+                resume -= skip
+                block = block[skip:]
+                if len(block) == 0 and not last:
+                    continue
+            audio = np.concatenate([carry, block])
+            cut = len(audio) if last else quietest_point(audio, len(audio) - search, search)
+            piece_segments = transcribe_piece(audio[:cut])
+            state["position"] += cut
+            carry = audio[cut:]
+            if checkpoint is not None:
+                checkpoint.save(state["position"], piece_segments)
+            if state["report"] is None:
+                update_job(job_id, message=f"{label}... {format_duration(state['position'] / SAMPLE_RATE)} done")
+        transcribe_piece(carry)
+        state["position"] += len(carry)
+    finally:
+        transcribe_progress.callback = None
+    
+    if state["position"] == 0:
+        raise Exception("No audio could be extracted from the video")
+    print(f"Streamed {state['position'] / SAMPLE_RATE:.1f} seconds of audio, "
+          f"skipped {state['skipped'] / SAMPLE_RATE:.1f} seconds of silence")
+    if model is whisper_model:
+        model_warm.set()
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+def check_ffmpeg():
+    try:
+        ffmpeg_check = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, timeout=10)
+        if ffmpeg_check.returncode != 0:
+            raise Exception("FFmpeg not found")
+        print("FFmpeg is available")
+    except Exception as e:
+        print(f"FFmpeg check failed: {e}")
+        raise Exception(f"FFmpeg not available: {str(e)}")
+
+def extract_audio(job_id, video_path, media=None):
+    # Decoded audio with long silences cut out, plus the timeline to map timestamps back (None if nothing was cut)
+    check_ffmpeg()
+    
+    # Step 1: Convert to audio
+    print("Converting video to audio...")
+    update_job(job_id, status="processing", progress=30, message="Converting video to audio...")
+    audio = load_audio(video_path, media)
+    print(f"Audio conversion complete: {len(audio) / SAMPLE_RATE:.1f} seconds")
+    
+    # Cut out long silences; Whisper spends full compute on them and sometimes hallucinates text there
+    timeline = None
+    if VAD_ENABLED:
+        regions = find_speech_regions(audio)
+        skipped = (len(audio) - sum(end - start for start, end in regions)) / SAMPLE_RATE
+        if skipped > 0:
+            timeline = SpeechTimeline(regions)
+            audio = np.concatenate([audio[start:end] for start, end in regions]) if regions else audio[:0]
+        print(f"Skipping {skipped:.1f} seconds of silence")
+        update_job(job_id, skipped_seconds=round(skipped, 1))
+    return audio, timeline
+
+def transcribe_audio(job_id, audio, timeline, on_draft=None, refine=False):
+    # With on_draft, the audio is first transcribed with the draft model and on_draft gets that result
+    # before the full model runs. Only the draft's segments are published live then; the refined
+    # transcript replaces them once it is complete. refine=True is for a draft that was made elsewhere.
+    if len(audio) == 0:
+        return {"text": "", "segments": []}
+    
+    # Step 2: Transcribe
+    duration = len(audio) / SAMPLE_RATE
+    restore = timeline.restore if timeline is not None else (lambda segments: segments)
+    publish = lambda segments: append_segments(job_id, restore(segments))
+    if on_draft is not None:
+        update_job(job_id, status="processing", progress=30, message="Transcribing draft...")
+        print(f"Starting draft transcription with the {DRAFT_MODEL} model...")
+        draft = transcribe_windows(get_draft_model(), audio, transcription_reporter(job_id, duration, "Transcribing draft", 30, 50),
+                                   publish, DRAFT_DECODE_OPTIONS)
+        draft["segments"] = restore(draft["segments"])
+        on_draft(draft)
+        refine = True
+    if refine:
+        report = transcription_reporter(job_id, duration, "Refining transcript", 50, 80)
+        publish = lambda segments: None
+    else:
+        update_job(job_id, status="processing", progress=40, message="Transcribing audio...")
+        report = transcription_reporter(job_id, duration)
+    
+    if TRANSCRIBE_WORKERS > 1 and len(audio) > CHUNK_SECONDS * SAMPLE_RATE:
+        checkpoint = TranscriptionCheckpoint(job_id, "parallel", CHUNK_SECONDS, CHUNK_OVERLAP_SECONDS)
+        result = transcribe_parallel(audio, on_progress=report, on_segments=publish, checkpoint=checkpoint)
+    else:
+        model = get_whisper_model()
+        print("Starting transcription...")
+        checkpoint = TranscriptionCheckpoint(job_id, "windows", TRANSCRIBE_WINDOW_SECONDS)
+        result = transcribe_windows(model, audio, report, publish, checkpoint=checkpoint)
+    
+    result["segments"] = restore(result["segments"])
+    return result
+
+def transcribe_video(job_id, video_path, on_draft=None, media=None, refine=False):
+    # Decoding and transcription in one go; see transcribe_audio for on_draft and refine
+    if TRANSCRIBE_STREAMING:
+        check_ffmpeg()
+        if on_draft is not None:
+            on_draft(transcribe_streaming(job_id, video_path, get_draft_model(), DRAFT_DECODE_OPTIONS,
+                                          "Transcribing draft", 30, 50, media=media))
+            refine = True
+        checkpoint = TranscriptionCheckpoint(job_id, "streaming", TRANSCRIBE_WINDOW_SECONDS)
+        if refine:
+            return transcribe_streaming(job_id, video_path, get_whisper_model(), label="Refining transcript",
+                                        low=50, high=80, live=False, media=media, checkpoint=checkpoint)
+        return transcribe_streaming(job_id, video_path, get_whisper_model(), media=media, checkpoint=checkpoint)
+    audio, timeline = extract_audio(job_id, video_path, media)
+    return transcribe_audio(job_id, audio, timeline, refine=refine)
+
+def probe_upload_start(ctx):
+    # ffprobe on the first EARLY_PROBE_BYTES of an upload that is still arriving. Returns the media info if it
+    # can read the format, so FFmpeg can be fed the upload as it arrives. None for formats that need the whole
+    # file, like MP4s with their index at the end, and for uploads that completed meanwhile.
+    update_job(ctx["job_id"], progress=5, message="Waiting for the upload...")
+    meta = upload_store.wait_for(ctx["upload_id"], EARLY_PROBE_BYTES)
+    if meta["sha256"] is not None:
+        return None
+    try:
+        media = probe_media(meta["path"])
+    except UnsupportedMediaError as e:
+        print(f"Can't read the start of the upload ({e}), waiting for all of it")
+        return None
+    if media is not None:
+        media["duration"] = None  # estimated from part of the file
+    return media
+
+def upload_window_bytes(media):
+    # Roughly one transcription window of the upload, from the container's bit rate (a guess without it)
+    if media.get("bit_rate"):
+        return max(EARLY_PROBE_BYTES, int(media["bit_rate"] / 8 * TRANSCRIBE_WINDOW_SECONDS))
+    return 2 * EARLY_PROBE_BYTES
+
+def wait_for_upload(ctx):
+    # Runs on a thread of its own while the job's upload is still arriving, so waiting for the network takes
+    # no stage slot. Once a window's worth of a format FFmpeg can read from the start is in, the job goes to
+    # the transcription stage and is transcribed while the rest arrives. Otherwise, and after a live
+    # transcription gave up (live_media is None then), the job waits for the whole file and goes back to
+    # the extraction stage.
+    job_id = ctx["job_id"]
+    try:
+        if "live_media" not in ctx:
+            ctx["live_media"] = probe_upload_start(ctx)
+        if ctx["live_media"] is not None:
+            meta = upload_store.wait_for(ctx["upload_id"], upload_window_bytes(ctx["live_media"]))
+            if meta["sha256"] is None:
+                update_job(job_id, message="Waiting for a transcription slot...")
+                transcribe_stage.submit(job_id, transcribe_step, (ctx,), block=True)
+                return
+        update_job(job_id, message="Waiting for the upload to finish...")
+        finish_upload(ctx)
+        extract_stage.submit(job_id, decode_step, (ctx,), block=True)
+    except Exception as e:
+        fail_job(ctx, e)
+
+def start_upload_wait(ctx):
+    threading.Thread(target=wait_for_upload, args=(ctx,), daemon=True, name=f"upload-{ctx['job_id'][:8]}").start()
+
+def finish_upload(ctx):
+    # Waits for the rest of the upload and takes it over; from here on the job works on the file
+    upload_store.wait_for(ctx["upload_id"])
+    meta = upload_store.take(ctx["upload_id"])
+    if meta is None:
+        raise Exception("The upload was removed")
+    ctx.update(video_path=meta["path"], content_hash=meta["sha256"], upload_id=None)
+    ctx["media"] = probe_media(meta["path"])  # the whole file now: real duration, and no audio is an error
+    if job_store.shared:
+        job_store.set_payload(ctx["job_id"], job_payload(ctx))  # a worker taking the job over needs the file now
+
+def transcribe_live_upload(ctx, on_draft=None):
+    # Pipes the upload into FFmpeg as it arrives and transcribes it window by window while the rest is
+    # transferred (with a draft model, that is the draft pass). Returns None if that fails, e.g. for a
+    # format ffprobe reads from the start but FFmpeg can't decode from a pipe, or when no data arrived for
+    # UPLOAD_STALL_SECONDS; the job then waits for the complete file outside the transcription slot.
+    job_id, upload_id = ctx["job_id"], ctx["upload_id"]
+    print(f"Transcribing upload {upload_id} while it arrives")
+    result = draft = None
+    try:
+        check_ffmpeg()
+        feed = upload_store.follow(upload_id, UPLOAD_STALL_SECONDS)
+        if on_draft is not None:
+            draft = transcribe_streaming(job_id, "pipe:0", get_draft_model(), DRAFT_DECODE_OPTIONS, "Transcribing draft",
+                                         30, 50, media=ctx["live_media"], feed=feed)
+        else:
+            checkpoint = TranscriptionCheckpoint(job_id, "streaming", TRANSCRIBE_WINDOW_SECONDS)
+            result = transcribe_streaming(job_id, "pipe:0", get_whisper_model(), media=ctx["live_media"], feed=feed,
+                                          checkpoint=checkpoint)
+    except Exception as e:
+        print(f"Transcribing during the upload failed ({e}), waiting for all of it")
+        update_job(job_id, transcript="", segments=[], message="Waiting for the upload to finish...")
+        return None
+    finish_upload(ctx)  # the whole upload went through FFmpeg, so it is complete
+    if draft is not None:
+        on_draft(draft)
+        result = transcribe_video(job_id, ctx["video_path"], media=ctx["media"], refine=True)
+    return result
+
+def summarize_draft(job_id, draft, api_key, summary_length, summary_format):
+    # Early summary of the draft transcript, shown until the refined one is ready
+    try:
+        summary = generate_summary(api_key, draft["text"], summary_length, summary_format, draft["segments"])
+        update_job(job_id, summary=summary, summary_tier="draft")
+        print(f"Draft summary generated. Length: {len(summary)} characters")
+    except Exception as e:
+        print(f"Draft summary failed: {e}")
+
+def draft_publisher(ctx):
+    # on_draft callback for the transcription functions, None without a draft model. The draft's segments
+    # are already on the job; this marks the tier and optionally summarizes it alongside the refinement.
+    if not DRAFT_MODEL:
+        return None
+    
+    def publish_draft(draft):
+        update_job(ctx["job_id"], tier="draft", progress=50,
+                   message=f"Draft transcript ready, refining with the {WHISPER_MODEL} model...")
+        print(f"Draft transcript ready. Length: {len(draft['text'])} characters")
+        if DRAFT_SUMMARY and draft["text"].strip():
+            ctx["draft_summary"] = threading.Thread(target=summarize_draft, daemon=True, args=(
+                ctx["job_id"], draft, ctx["api_key"], ctx["summary_length"], ctx["summary_format"]))
+            ctx["draft_summary"].start()
+    
+    return publish_draft
+
+# Processing runs as a pipeline (see the stages above). A job is a dict handed from step to step:
+# job_id, api_key, summary_length, summary_format, and the input as video_path/content_hash/media or
+# as the upload_id of an upload that is still arriving.
+def job_context(job_id, api_key, summary_length, summary_format, video_path=None, content_hash=None,
+                media=None, upload_id=None):
+    return {"job_id": job_id, "api_key": api_key, "summary_length": summary_length,
+            "summary_format": summary_format, "video_path": video_path, "content_hash": content_hash,
+            "media": media, "upload_id": upload_id}
+
+def job_payload(ctx):
+    # What the shared job store keeps to run the job, or run it again after a worker is lost
+    return {key: ctx[key] for key in ("job_id", "api_key", "summary_length", "summary_format", "video_path",
+                                      "content_hash", "media", "upload_id")}
+
+def transcript_cache_key(ctx):
+    # Same media with the same model and options gives the same transcript
+    return transcript_cache.key(ctx["content_hash"], MODEL_ID, TRANSCRIPT_OPTIONS)
+
+def publish_transcript(ctx, result):
+    ctx["result"] = result
+    update_job(ctx["job_id"], transcript=result["text"], segments=result["segments"], tier="final")
+    print(f"Transcription complete. Length: {len(result['text'])} characters")
+
+def remove_video(ctx):
+    try:
+        if ctx["video_path"] and os.path.exists(ctx["video_path"]):
+            os.remove(ctx["video_path"])
+            print("Video file cleaned up")
+    except Exception as cleanup_error:
+        print(f"Cleanup error: {cleanup_error}")
+
+def fail_job(ctx, error):
+    print(f"Error processing job {ctx['job_id']}: {error}")
+    update_job(ctx["job_id"], status="error", progress=0, message=f"Error: {str(error)}")
+    remove_video(ctx)
+
+def extract_step(ctx):
+    # Extraction stage, where every job starts. Uploads that are still arriving are waited for outside the
+    # stages (see wait_for_upload).
+    job_id = ctx["job_id"]
+    try:
+        print(f"Starting video processing for: {ctx['video_path'] or ctx['upload_id'] or ctx['content_hash']}")
+        if (get_job(job_id) or {}).get("resumed"):
+            # Taken over from a lost worker: its transcription checkpoint is republished, the rest starts over.
+            # Emptying the segments makes open progress streams start over too (see progress_stream).
+            update_job(job_id, transcript="", segments=[], summary="", tier=None, summary_tier=None, resumed=False)
+        update_job(job_id, status="processing", progress=20, message="Processing started...")
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)  # 5 minute timeout
-        
-        if result.returncode != 0:
-            print(f"FFmpeg stderr: {result.stderr}")
-            raise Exception(f"FFmpeg error: {result.stderr}")
-        
-        print(f"Audio conversion complete: {audio_path}")
-        
-        # Check if audio file was created
-        if not os.path.exists(audio_path):
-            raise Exception("Audio file was not created")
-        
-        # Step 2: Transcribe
-        print("Loading Whisper model...")
-        processing_status = {"status": "processing", "progress": 60, "message": "Transcribing audio..."}
-        
-        if whisper_model is None:
-            print("Loading Whisper base model...")
-            whisper_model = whisper.load_model("base")
-            print("Whisper model loaded")
+        if ctx["upload_id"] is not None:
+            if (upload_store.status(ctx["upload_id"]) or {}).get("sha256") is None:
+                start_upload_wait(ctx)
+                return
+            finish_upload(ctx)
+    except Exception as e:
+        fail_job(ctx, e)
+        return
+    decode_step(ctx)
+
+def decode_step(ctx):
+    # Extraction stage: transcript cache lookup and decoding with FFmpeg
+    job_id = ctx["job_id"]
+    try:
+        # Same media with the same model and options: skip FFmpeg and Whisper entirely
+        result = transcript_cache.get(transcript_cache_key(ctx))
+        if result is not None:
+            print(f"Transcript cache hit for {ctx['content_hash']}")
+            publish_transcript(ctx, result)
+            summarize_stage.submit(job_id, summarize_step, (ctx,), block=True)
+            return
+        if ctx["video_path"] is None:
+            raise Exception("The transcript of this file is no longer cached, please upload it again")
         
-        print("Starting transcription...")
-        result = whisper_model.transcribe(audio_path)
-        current_transcript = result["text"]
-        print(f"Transcription complete. Length: {len(current_transcript)} characters")
+        update_job(job_id, message="Waiting for a transcription slot...")
+        if TRANSCRIBE_STREAMING:
+            # Streaming decodes inside the transcription stage, window by window
+            transcribe_stage.submit(job_id, transcribe_step, (ctx,), block=True)
+            return
+        # Decoded only once the transcription queue has room for it, so an extraction worker waiting on
+        # a busy transcription stage doesn't hold a whole recording in memory meanwhile
+        transcribe_stage.reserve()
+        try:
+            ctx["audio"], ctx["timeline"] = extract_audio(job_id, ctx["video_path"], ctx["media"])
+        except Exception:
+            transcribe_stage.release()
+            raise
+        transcribe_stage.submit(job_id, transcribe_step, (ctx,), reserved=True)
+    except Exception as e:
+        fail_job(ctx, e)
+
+def transcribe_step(ctx):
+    # Transcription stage: Whisper, MAX_CONCURRENT_JOBS at a time
+    job_id = ctx["job_id"]
+    try:
+        on_draft = draft_publisher(ctx)
+        if ctx["upload_id"] is not None:
+            result = transcribe_live_upload(ctx, on_draft)
+            if result is None:
+                ctx["live_media"] = None
+                start_upload_wait(ctx)  # frees the slot until the rest of the upload is in
+                return
+        elif "audio" in ctx:
+            result = transcribe_audio(job_id, ctx.pop("audio"), ctx.pop("timeline"), on_draft)
+        else:
+            result = transcribe_video(job_id, ctx["video_path"], on_draft, ctx["media"])
+        transcript_cache.put(transcript_cache_key(ctx), result)
+        publish_transcript(ctx, result)
+        summarize_stage.submit(job_id, summarize_step, (ctx,), block=True)
+    except Exception as e:
+        fail_job(ctx, e)
+
+def summarize_step(ctx):
+    # Summarization stage: Gemini, many jobs at a time since it is mostly waiting on the network
+    job_id = ctx["job_id"]
+    try:
+        transcript = ctx["result"]["text"]
         
         # Step 3: Summarize
-        print("Generating summary...")
-        processing_status = {"status": "processing", "progress": 80, "message": "Generating summary..."}
-        
-        client = genai.Client(api_key=api_key)
-        
-        prompt = f"""I need to make you the summary of the meeting. It should look like the example.
-
-Format (format 1 or format 2 or format 3): {summary_format}
-Length of the summary (very short, short, medium, long): {summary_length}
-
-Format guidelines:
-- Format 1 (Executive Summary): Organized with bullet points. All bullet points at the equal level. Always starts with 'Talking points:'. Each bullet points starts with character •
-- Format 2 (Structured Meeting Notes): Organized with bullet points. one bullet point can have one or few subbullet points. Always starts with 'Talking points:'. Each bullet points starts with character •
-- Format 3 (Executive Summary): A concise narrative format, divided by paragraphs. Do NOT use any bullet points or asterisk (*)!
-Length guidelines:
-- Very short: Maximum 3-5 main talking points, each with only 1-2 bullet points. Focus on the most critical decisions and next steps only.
-- Short: 5-8 main talking points with 2-3 bullet points each. Include key decisions, main discussions, and important next steps.
-- Medium: 8-12 main talking points with 3-4 bullet points each. Include detailed discussions, background context, and comprehensive next steps.
-- Long: 12+ main talking points with 4+ bullet points each. Include all discussions, full context, detailed explanations, and comprehensive action items.
-
-Please format it as an example and in your answer and just write summary, nothing like 'here you go:
-
-EXAMPLE Format 1:
-Talking points:
-• Two parallel initiatives are underway: enhancing internal documentation practices and refining cross-team collaboration workflows.
-• The documentation initiative introduces a new Notion-based template system, designed to improve onboarding and reduce duplicate knowledge. Early feedback highlights better clarity and discoverability.
-• The collaboration workflow initiative encourages proactive alignment during planning phases. The pilot use case is the re-architecture of the Notification Queue, coordinated by Priya.
-• The Web team is evaluating whether to refactor the current alert system now or wait until the Q4 performance sprint to consolidate efforts.
-• The Slackbot automation pilot has concluded after three iterations. Insights were captured in Confluence, and the team agreed to sunset the bot. The underlying scripts will be deprecated to reduce maintenance overhead.
-
-EXAMPLE Format 2:
-Talking points:
-• Workout recommendation engine update entering limited release January 10–11:
-  • Early tests show strong accuracy improvements over legacy logic
-  • Deployment pipeline has a critical timeout issue that must be resolved before rollout
-  • Maya will collaborate with Leo to debug deployment blocker offline
-• New “Today’s Focus” module under development for user homepage prototype:
-  • Objective is to validate behavior triggers ahead of the Q2 personalized coaching launch
-  • Initial version will act as a dynamic widget with A/B support for motivational prompts
-  • Jenna will finalize feature specs after her strategy sync in San Francisco this week
-• Team member updates:
-  • Leo: Wrapped backend latency audit, now focused on error tracing for batch endpoints
-  • Sarah: Completing frontend edge-case QA for hydration tracker
-  • James: Finalizing Android biometric auth issues, then resuming image compression tasks
-  • Ren: Investigating user session drop-offs and preparing patch for event queue instability
-  • Tanya: Implementing new calendar sync logic and cross-platform UI consistency checks
-  • Marcus: Workout summary redesign in final stages, polishing animation timing and layout spacing
-
-EXAMPLE Format 3:
-The meeting centered around recent product performance metrics and strategic shifts in the roadmap. A decline in user engagement on the mobile app prompted the leadership team to pause development on two lesser-used features and reallocate resources.
-
-To maintain velocity on core initiatives, current engineering staffing levels will be preserved. The team discussed shifting ownership of parts of the Analytics pipeline and Notification System to ensure better alignment with growth goals.
-
-The Helix and Orbit integrations will be sunsetted next quarter, which will reduce complexity but temporarily limit some partner functionality. Over the next month, the team will join cross-functional sessions to help shape the updated product vision and long-term KPIs.
-
-Leadership acknowledged ongoing tensions around roadmap clarity, reiterating that near-term focus will be on initiatives tied directly to user retention and daily active usage growth.
-
-Here is the transcript to summarize:
-{current_transcript}"""
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
-        current_summary = response.text
-        print(f"Summary generated. Length: {len(current_summary)} characters")
+        if ctx.get("draft_summary") is not None:
+            ctx["draft_summary"].join()  # so the draft summary can't overwrite the final one
+        if transcript.strip():
+            print("Generating summary...")
+            update_job(job_id, status="processing", progress=80, message="Generating summary...", eta_seconds=None)
+            
+            summary = generate_summary(ctx["api_key"], transcript, ctx["summary_length"], ctx["summary_format"],
+                                       ctx["result"]["segments"])
+            update_job(job_id, summary=summary, summary_tier="final")
+            print(f"Summary generated. Length: {len(summary)} characters")
+            summary_speculator.submit(ctx["api_key"], transcript, ctx["result"]["segments"], ctx["summary_length"],
+                                      ctx["summary_format"])
+        else:
+            update_job(job_id, summary="", summary_tier=None)
+            print("No speech found, skipping summary")
         
         # Cleanup
-        try:
-            if os.path.exists(video_path):
-                os.remove(video_path)
-                print("Video file cleaned up")
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-                print("Audio file cleaned up")
-        except Exception as cleanup_error:
-            print(f"Cleanup error: {cleanup_error}")
-        
-        processing_status = {"status": "complete", "progress": 100, "message": "Processing complete!"}
+        remove_video(ctx)
+        
+        message = "Processing complete!" if transcript.strip() else "Processing complete: no speech found in the recording"
+        update_job(job_id, status="complete", progress=100, message=message)
         print("Processing completed successfully!")
         
     except Exception as e:
-        print(f"Error in process_video_thread: {e}")
-        processing_status = {"status": "error", "progress": 0, "message": f"Error: {str(e)}"}
+        fail_job(ctx, e)
 
-if __name__ == "__main__":
+boot_timings["import_seconds"] = round(time.time() - BOOT_STARTED, 2)
+print(f"App imported in {boot_timings['import_seconds']} s")
+
+def run_worker():
+    # `python app.py worker`: processes jobs from the shared job store without serving requests
+    if not job_store.shared:
+        sys.exit("The worker needs a shared job store: set JOB_STORE=sqlite (and the same JOB_DB_PATH as the web app)")
+    if not PROCESS_JOBS:
+        sys.exit("PROCESS_JOBS=0 leaves the worker nothing to do")
+    print(f"Starting Video Summarizer worker on {job_store.path}")
+    if WHISPER_PRELOAD:
+        start_warm_up()
+    job_claimer.start()
+    while True:
+        time.sleep(3600)
+
+if __name__ == "__main__" and sys.argv[1:] == ["worker"]:
+    run_worker()
+elif __name__ == "__main__":
     port = int(os.environ.get("PORT", 3000))
     debug = os.environ.get("FLASK_ENV") == "development"
     
@@ -787,5 +3524,8 @@ if __name__ == "__main__":
     print(f"- http://127.0.0.1:{port}")
     print("")
     
+    if WHISPER_PRELOAD:
+        start_warm_up()
+    
     # Production-ready Flask settings
     app.run(debug=debug, host='0.0.0.0', port=port, threaded=True)
\ No newline at end of file
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Compare Whisper inference profiles on a fixed sample.
+
+Prints the real-time factor (transcription time / audio duration, lower is faster) and, when a reference
+transcript is given, the word error rate of every profile, so you can pick WHISPER_PROFILE for your hosts.
+
+    python benchmark.py --threads 4
+    python benchmark.py --audio sample.wav --reference sample.txt --threads 4
+
+Without --audio a fixed public-domain sample is downloaded once (into CACHE_DIR) and scored against its
+known transcript, so results from different machines can be compared. --markdown prints the rows for the
+table in the README.
+"""
+import argparse
+import os
+import re
+import time
+import urllib.request
+
+import app
+
+# John F. Kennedy's inaugural address (1961, public domain), as shipped with whisper.cpp's samples
+SAMPLE_URL = "https://github.com/ggml-org/whisper.cpp/raw/master/samples/jfk.wav"
+SAMPLE_REFERENCE = ("And so my fellow Americans, ask not what your country can do for you, "
+                    "ask what you can do for your country.")
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    # Word-level Levenshtein distance divided by the number of reference words
+    reference_words = normalize(reference)
+    hypothesis_words = normalize(hypothesis)
+    previous = list(range(len(hypothesis_words) + 1))
+    for i, reference_word in enumerate(reference_words, 1):
+        current = [i]
+        for j, hypothesis_word in enumerate(hypothesis_words, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (reference_word != hypothesis_word)))
+        previous = current
+    return previous[-1] / max(1, len(reference_words))
+
+
+def sample_path():
+    # Downloads the sample on first use
+    path = os.path.join(app.CACHE_DIR, "benchmark", os.path.basename(SAMPLE_URL))
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        print(f"Downloading {SAMPLE_URL}")
+        urllib.request.urlretrieve(SAMPLE_URL, path + ".part")
+        os.replace(path + ".part", path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="audio or video file to transcribe (default: the downloaded sample)")
+    parser.add_argument("--reference", help="text file with the correct transcript, for the word error rate")
+    parser.add_argument("--profiles", nargs="+", default=list(app.INFERENCE_PROFILES),
+                        choices=list(app.INFERENCE_PROFILES))
+    parser.add_argument("--threads", type=int, default=app.threads_per_job(),
+                        help="torch threads, as one job slot would get (default: %(default)s)")
+    parser.add_argument("--runs", type=int, default=1, help="timed runs per profile; the fastest is reported")
+    parser.add_argument("--markdown", action="store_true", help="print the results as rows of the README table")
+    args = parser.parse_args()
+
+    if args.audio:
+        audio = app.load_audio(args.audio)
+        reference = open(args.reference, encoding="utf-8").read() if args.reference else None
+    else:
+        audio = app.load_audio(sample_path())
+        reference = SAMPLE_REFERENCE
+    duration = len(audio) / app.SAMPLE_RATE
+    app.configure_torch_threads(args.threads)
+    print(f"Sample: {duration:.1f} s of audio, {args.threads} threads")
+    print("")
+    if args.markdown:
+        print("| Profile | RTF | WER |")
+        print("|---|---|---|")
+    else:
+        print(f"{'profile':<10} {'model':<12} {'beam':>4} {'temperatures':<20} {'load s':>7} {'RTF':>6} {'WER':>6}")
+
+    for name in args.profiles:
+        # Named profiles as defined, without the WHISPER_* environment overrides
+        profile = app.inference_profile(name, env={})
+        options = app.decode_options(profile)
+
+        started = time.time()
+        model = app.load_whisper_model(profile["model"], profile["quantize"])
+        load_seconds = time.time() - started
+        model.transcribe(audio[:app.SAMPLE_RATE], verbose=None, **options)  # warm-up, not timed
+
+        best = None
+        for _ in range(args.runs):
+            started = time.time()
+            result = model.transcribe(audio, verbose=None, **options)
+            elapsed = time.time() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        model_id = profile["model"] + ("-int8" if profile["quantize"] else "")
+        temperatures = ",".join(f"{t:g}" for t in profile["temperature"])
+        wer = f"{word_error_rate(reference, result['text']):.1%}" if reference else "-"
+        if args.markdown:
+            print(f"| `{name}` | {best / duration:.3f} | {wer} |")
+            continue
+        print(f"{name:<10} {model_id:<12} {profile['beam_size'] or 1:>4} {temperatures:<20} "
+              f"{load_seconds:>7.1f} {best / duration:>6.3f} {wer:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# Picked up automatically by gunicorn from the working directory
+import gc
+import os
+
+# With WHISPER_SHARED_MODEL=1 the app, and with it the Whisper model, is loaded once in the master before
+# the workers are forked. The workers then share the model's memory copy-on-write instead of each loading
+# their own copy. Compare pss_mb and shared_*_mb per worker at /stats.
+preload_app = os.environ.get("WHISPER_SHARED_MODEL") == "1"
+
+
+def when_ready(server):
+    if preload_app:
+        # Runs once in the master, before the workers are forked, so they share the weight pages. Only
+        # here: other processes importing the app (transcription pool workers, `python app.py worker`,
+        # benchmark.py) load their own model when they need it. Load only: running an inference here
+        # would start torch's thread pools, which don't survive the fork.
+        import app
+        app.get_whisper_model()
+        # Keep the garbage collector in the workers from writing to (and so un-sharing) the pages of
+        # every object the master has allocated so far
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # With WHISPER_PRELOAD=1 each worker loads and warms up the Whisper model in the background right
+    # after it is forked, instead of on its first job. /ready reports 503 until that has finished.
+    if os.environ.get("WHISPER_PRELOAD") == "1":
+        import app
+        app.start_warm_up()
+    # With the shared job store, idle workers take queued jobs without waiting for a request of their own
+    if os.environ.get("JOB_STORE") == "sqlite":
+        import app
+        app.job_claimer.start()
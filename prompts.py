@@ -0,0 +1,99 @@
+"""Prompts for the Gemini summaries.
+
+The instructions and examples are the same for every request, so they are built once, as SUMMARY_PREFIX.
+The chosen format and length and then the transcript come after it. Requests sharing a long identical
+prefix can be served from Gemini's context cache, and only the variable tail is assembled per call.
+"""
+
+CHARS_PER_TOKEN = 4  # rough average for English text
+TRANSCRIPT_SOURCE = "Here is the transcript to summarize:"
+NOTES_SOURCE = "Here are notes on consecutive parts of the meeting, in order. Summarize the whole meeting:"
+CONDENSE_SOURCE = "Here is a longer summary of the meeting. Condense it, keeping the most important points:"
+
+SUMMARY_PREFIX = """I need to make you the summary of the meeting. It should look like the example.
+
+Format guidelines:
+- Format 1 (Executive Summary): Organized with bullet points. All bullet points at the equal level. Always starts with 'Talking points:'. Each bullet points starts with character •
+- Format 2 (Structured Meeting Notes): Organized with bullet points. one bullet point can have one or few subbullet points. Always starts with 'Talking points:'. Each bullet points starts with character •
+- Format 3 (Executive Summary): A concise narrative format, divided by paragraphs. Do NOT use any bullet points or asterisk (*)!
+Length guidelines:
+- Very short: Maximum 3-5 main talking points, each with only 1-2 bullet points. Focus on the most critical decisions and next steps only.
+- Short: 5-8 main talking points with 2-3 bullet points each. Include key decisions, main discussions, and important next steps.
+- Medium: 8-12 main talking points with 3-4 bullet points each. Include detailed discussions, background context, and comprehensive next steps.
+- Long: 12+ main talking points with 4+ bullet points each. Include all discussions, full context, detailed explanations, and comprehensive action items.
+
+Please format it as an example and in your answer and just write summary, nothing like 'here you go:
+
+EXAMPLE Format 1:
+Talking points:
+• Two parallel initiatives are underway: enhancing internal documentation practices and refining cross-team collaboration workflows.
+• The documentation initiative introduces a new Notion-based template system, designed to improve onboarding and reduce duplicate knowledge. Early feedback highlights better clarity and discoverability.
+• The collaboration workflow initiative encourages proactive alignment during planning phases. The pilot use case is the re-architecture of the Notification Queue, coordinated by Priya.
+• The Web team is evaluating whether to refactor the current alert system now or wait until the Q4 performance sprint to consolidate efforts.
+• The Slackbot automation pilot has concluded after three iterations. Insights were captured in Confluence, and the team agreed to sunset the bot. The underlying scripts will be deprecated to reduce maintenance overhead.
+
+EXAMPLE Format 2:
+Talking points:
+• Workout recommendation engine update entering limited release January 10–11:
+  • Early tests show strong accuracy improvements over legacy logic
+  • Deployment pipeline has a critical timeout issue that must be resolved before rollout
+  • Maya will collaborate with Leo to debug deployment blocker offline
+• New “Today’s Focus” module under development for user homepage prototype:
+  • Objective is to validate behavior triggers ahead of the Q2 personalized coaching launch
+  • Initial version will act as a dynamic widget with A/B support for motivational prompts
+  • Jenna will finalize feature specs after her strategy sync in San Francisco this week
+• Team member updates:
+  • Leo: Wrapped backend latency audit, now focused on error tracing for batch endpoints
+  • Sarah: Completing frontend edge-case QA for hydration tracker
+  • James: Finalizing Android biometric auth issues, then resuming image compression tasks
+  • Ren: Investigating user session drop-offs and preparing patch for event queue instability
+  • Tanya: Implementing new calendar sync logic and cross-platform UI consistency checks
+  • Marcus: Workout summary redesign in final stages, polishing animation timing and layout spacing
+
+EXAMPLE Format 3:
+The meeting centered around recent product performance metrics and strategic shifts in the roadmap. A decline in user engagement on the mobile app prompted the leadership team to pause development on two lesser-used features and reallocate resources.
+
+To maintain velocity on core initiatives, current engineering staffing levels will be preserved. The team discussed shifting ownership of parts of the Analytics pipeline and Notification System to ensure better alignment with growth goals.
+
+The Helix and Orbit integrations will be sunsetted next quarter, which will reduce complexity but temporarily limit some partner functionality. Over the next month, the team will join cross-functional sessions to help shape the updated product vision and long-term KPIs.
+
+Leadership acknowledged ongoing tensions around roadmap clarity, reiterating that near-term focus will be on initiatives tied directly to user retention and daily active usage growth.
+
+"""
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+SUMMARY_PREFIX_TOKENS = estimate_tokens(SUMMARY_PREFIX)
+
+
+def summary_settings(summary_length, summary_format, source):
+    return (f"Format (format 1 or format 2 or format 3): {summary_format}\n"
+            f"Length of the summary (very short, short, medium, long): {summary_length}\n\n"
+            f"{source}\n")
+
+
+def build_summary_prompt(text, summary_length, summary_format, source=TRANSCRIPT_SOURCE):
+    # Static prefix first, the transcript (or notes, or summary) last
+    return SUMMARY_PREFIX + summary_settings(summary_length, summary_format, source) + text
+
+
+def summary_prompt_tokens(text, summary_length, summary_format, source=TRANSCRIPT_SOURCE):
+    # Estimated size of build_summary_prompt(...) without building it; the prefix is counted once at import
+    settings = summary_settings(summary_length, summary_format, source)
+    return SUMMARY_PREFIX_TOKENS + estimate_tokens(settings) + estimate_tokens(text)
+
+
+def build_condense_prompt(summary, summary_length, summary_format):
+    return build_summary_prompt(summary, summary_length, summary_format, CONDENSE_SOURCE)
+
+
+def build_partial_summary_prompt(text, part, parts):
+    return f"""Below is part {part} of {parts} of a meeting transcript. Write detailed notes on this part only: \
+every topic discussed, decisions made, action items with their owners and dates, and important numbers or names. \
+Keep the order in which things were discussed. Write plain bullet points and nothing else.
+
+Part {part} of {parts}:
+{text}"""